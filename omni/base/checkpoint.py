@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Checkpoints for long-running calculations.
+Partial per-frame results are written to a directory next to the placeholder dat file in the post spot so
+that the next `make compute` can resume from the last completed block of frames.
+"""
+
+import os,re,json,time,shutil
+from base.tools import status
+from base.store import load,store
+
+class Checkpoint:
+	"""
+	Register periodic checkpoints of partial per-frame results for a single job.
+	Each call to save stores arrays for the frames between the resume frame and a stop frame.
+	"""
+	suffix = 'ckpt'
+	# seconds between checkpoints when calculations ask if one is due
+	interval = 600
+
+	def __init__(self,dat_fn,interval=None):
+		self.path = self.path_from_dat(dat_fn)
+		self.index_fn = os.path.join(self.path,'index.json')
+		self.interval = interval if interval else self.interval
+		self.last = time.time()
+		self.blocks = []
+		if os.path.isfile(self.index_fn):
+			with open(self.index_fn) as fp: self.blocks = json.load(fp)['blocks']
+			status('resuming from checkpoint at frame %d in %s'%(self.frame,self.path),tag='checkpoint')
+
+	@classmethod
+	def path_from_dat(cls,dat_fn): 
+		"""The checkpoint replaces the dat suffix or follows any other file name."""
+		return '%s.%s'%(re.sub('\.dat$','',dat_fn),cls.suffix)
+
+	@classmethod
+	def exists(cls,dat_fn):
+		"""Check for a checkpoint belonging to a dat file."""
+		return os.path.isfile(os.path.join(cls.path_from_dat(dat_fn),'index.json'))
+
+	@property
+	def frame(self):
+		"""The first frame which has not been checkpointed yet."""
+		return self.blocks[-1]['stop'] if self.blocks else 0
+
+	def due(self):
+		"""Tell the calculation whether it is time to save a checkpoint."""
+		return time.time()-self.last>=self.interval
+
+	def save(self,stop,attrs=None,**arrays):
+		"""
+		Store partial per-frame arrays which cover frames from the current resume frame up to stop.
+		The index is replaced atomically after the block is written so an interrupted save is ignored.
+		"""
+		if stop<=self.frame: raise Exception('checkpoint must advance past frame %d'%self.frame)
+		if not os.path.isdir(self.path): os.mkdir(self.path)
+		fn = 'block.%05d.dat'%len(self.blocks)
+		# a stray block from an interrupted save was never indexed so it is safe to replace
+		if os.path.isfile(os.path.join(self.path,fn)): os.remove(os.path.join(self.path,fn))
+		store(obj=arrays,name=fn,path=self.path,attrs=attrs if attrs else {},verbose=False)
+		blocks = self.blocks+[{'fn':fn,'start':self.frame,'stop':stop}]
+		with open(self.index_fn+'.tmp','w') as fp: json.dump({'blocks':blocks},fp)
+		os.rename(self.index_fn+'.tmp',self.index_fn)
+		self.blocks = blocks
+		self.last = time.time()
+		status('checkpoint saved through frame %d'%stop,tag='checkpoint')
+
+	def collect(self):
+		"""Concatenate the checkpointed arrays along the frame axis."""
+		import numpy as np
+		parts = [load(block['fn'],cwd=self.path) for block in self.blocks]
+		if not parts: return {}
+		return dict([(key,np.concatenate([part[key] for part in parts]))
+			for key in parts[0] if isinstance(parts[0][key],np.ndarray)])
+
+	def discard(self):
+		"""Remove the checkpoint once the final result is stored."""
+		if os.path.isdir(self.path): shutil.rmtree(self.path)
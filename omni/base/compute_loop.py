@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
 import time
-from joblib import Parallel,delayed
+from joblib import Parallel,delayed,effective_n_jobs
 # from joblib.pool import has_shareable_memory
 from .tools import status
 
@@ -28,3 +28,148 @@ def basic_compute_loop(compute_function,looper,run_parallel=True,debug=False):
 		for ll in framelooper(len(looper)):
 			incoming.append(compute_function(**looper[ll]))
 	return incoming
+
+class Reducer:
+	"""
+	Streaming reduction of per-frame outputs.
+	A partial reduction starts as None. The add function folds the output for one frame into a partial
+	and the combine function joins two partials from consecutive chunks of frames, so every chunk can be
+	reduced in a separate worker while holding only one partial in memory. Pass add and combine (and
+	optionally finish) to build a custom reducer or subclass it for the standard ones.
+	"""
+	def __init__(self,add=None,combine=None,finish=None):
+		if add: self.add = add
+		if combine: self.combine = combine
+		if finish: self.finish = finish
+
+	def add(self,partial,value): raise NotImplementedError('reducers must define add')
+
+	def combine(self,first,second): raise NotImplementedError('reducers must define combine')
+
+	def finish(self,partial): return partial
+
+	def merge(self,first,second):
+		"""Combine two partials when either may still be empty."""
+		if first is None: return second
+		elif second is None: return first
+		else: return self.combine(first,second)
+
+class Sum(Reducer):
+	"""Sum the per-frame outputs, which may be numbers or arrays of one shape."""
+	def add(self,partial,value):
+		import numpy as np
+		return np.array(value,dtype=float) if partial is None else partial+value
+
+	def combine(self,first,second): return first+second
+
+class MeanVariance(Reducer):
+	"""
+	Elementwise mean and variance of the per-frame outputs with Welford updates, which avoid the loss of
+	precision in the naive sum of squares. Partials are combined with the pairwise formula of Chan et al.
+	The result is a dictionary with the mean, the variance, and the number of frames.
+	"""
+	def __init__(self,ddof=0):
+		self.ddof = ddof
+
+	def add(self,partial,value):
+		import numpy as np
+		value = np.array(value,dtype=float)
+		if partial is None: return (1,value,np.zeros_like(value))
+		count,mean,m2 = partial
+		count += 1
+		delta = value-mean
+		mean = mean+delta/count
+		return (count,mean,m2+delta*(value-mean))
+
+	def combine(self,first,second):
+		(n_a,mean_a,m2_a),(n_b,mean_b,m2_b) = first,second
+		count = n_a+n_b
+		delta = mean_b-mean_a
+		return (count,mean_a+delta*n_b/float(count),m2_a+m2_b+delta**2*n_a*n_b/float(count))
+
+	def finish(self,partial):
+		if partial is None: raise Exception('cannot compute a mean without any frames')
+		count,mean,m2 = partial
+		import numpy as np
+		var = m2/(count-self.ddof) if count>self.ddof else np.full_like(m2,np.nan)
+		return dict(mean=mean,var=var,count=count)
+
+class Histogram(Reducer):
+	"""
+	Count the values from every frame in fixed bins. Bins are either the edges or a number of bins
+	spanning the range. Values outside the edges are not counted. The result is a dictionary with the 
+	counts and the edges.
+	"""
+	def __init__(self,bins,range=None):
+		import numpy as np
+		if isinstance(bins,int):
+			if range==None: raise Exception('a histogram with a number of bins needs a range')
+			self.edges = np.linspace(range[0],range[1],bins+1)
+		else: self.edges = np.array(bins,dtype=float)
+
+	def add(self,partial,value):
+		import numpy as np
+		counts = np.histogram(np.ravel(value),bins=self.edges)[0]
+		return counts if partial is None else partial+counts
+
+	def combine(self,first,second): return first+second
+
+	def finish(self,partial):
+		import numpy as np
+		counts = np.zeros(len(self.edges)-1,dtype=int) if partial is None else partial
+		return dict(counts=counts,edges=self.edges)
+
+def reduce_chunk(function,reducer,frames,reader=None,selection=None):
+	"""
+	Reduce the outputs of a frame function over one chunk of frames.
+	Without a reader the function receives the frame index. With a reader it also receives the
+	coordinates for the selection and the box dimensions, and the chunk is read with a new reader
+	restricted to the chunk so that workers never share a trajectory.
+	"""
+	partial = None
+	if reader==None:
+		for fr in frames: partial = reducer.add(partial,function(fr))
+		return partial
+	from .trajectory import TrajectoryReader
+	chunk = TrajectoryReader(window=(frames.start,frames.stop,frames.step),**reader)
+	for block in chunk.blocks(selection=selection,loud=False):
+		for ii,fr in enumerate(block.frames):
+			partial = reducer.add(partial,function(fr,block.coords[ii],block.dimensions[ii]))
+	return partial
+
+def reduce_frames(function,reducer,frames,n_jobs=1,chunks=None,selection=None,backend=None):
+	"""
+	Split-apply-combine over the frames of a calculation with constant memory.
+	The frames are a number of frames, a list of frame indices, or a TrajectoryReader. The function 
+	maps one frame to a value, which is folded into a partial reduction as soon as it is computed. Chunks
+	of consecutive frames are reduced in parallel with joblib and their partials are combined in order.
+	Use n_jobs=work.nprocs to stay within the cores for the job. Returns the finished reduction.
+	"""
+	start = time.time()
+	reader = None
+	if hasattr(frames,'frame_range'):
+		# readers are rebuilt in each worker from their settings
+		reader = dict(structure=frames.structure,trajectory=frames.trajectory,
+			selection=frames.selection,memory=frames.memory,selections=frames.selections,
+			coordinate_cache=frames.coordinate_cache,prefetch=False)
+		selection = frames.selection if selection==None else selection
+		frames = frames.frame_range()
+	elif isinstance(frames,int): frames = range(frames)
+	else: frames = list(frames)
+	if not chunks: chunks = 1 if effective_n_jobs(n_jobs)==1 else 4*effective_n_jobs(n_jobs)
+	size = max(1,-(-len(frames)//chunks))
+	pieces = [frames[ii:ii+size] for ii in range(0,len(frames),size)]
+	if len(pieces)==1 or effective_n_jobs(n_jobs)==1:
+		partials = []
+		for pnum,piece in enumerate(pieces):
+			status('reducing frames',i=pnum,looplen=len(pieces),tag='reduce',start=start)
+			partials.append(reduce_chunk(function,reducer,piece,reader=reader,selection=selection))
+	else:
+		status('reducing %d frames in %d chunks on %d workers'%(len(frames),len(pieces),n_jobs),
+			tag='reduce')
+		partials = Parallel(n_jobs=n_jobs,backend=backend)(
+			delayed(reduce_chunk)(function,reducer,piece,reader=reader,selection=selection) 
+			for piece in pieces)
+	partial = None
+	for item in partials: partial = reducer.merge(partial,item)
+	return reducer.finish(partial)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Memory-mapped coordinate cache.
+Decoding compressed trajectories is expensive, so a slice can be unpacked once into raw float32 numpy files
+next to its structure and trajectory. Readers then map the frames they need without decoding anything.
+"""
+
+import os,re,json,glob
+from base.tools import status
+
+class CoordinateCache:
+	"""
+	Coordinates with shape (n_frames,n_atoms,3) and box dimensions with shape (n_frames,6) for a slice.
+	The files share the basename of the trajectory. The stamp records the size and modification time of the
+	source files so the cache is rebuilt when the trajectory changes. The stamp is written last so an
+	interrupted build is never used.
+	"""
+	pattern = re.compile(r'\.(coords|boxes)\.npy$|\.coords\.json$|\.(coords|boxes)\.(npy|json)\.\d+\.tmp$')
+
+	def __init__(self,structure,trajectory):
+		self.structure = structure
+		self.trajectories = trajectory if isinstance(trajectory,list) else [trajectory]
+		base = re.sub(r'\.[^.]+$','',self.trajectories[0])
+		self.files = dict(coords=base+'.coords.npy',boxes=base+'.boxes.npy',stamp=base+'.coords.json')
+
+	@classmethod
+	def owns(cls,fn):
+		"""Check if a file in the post spot belongs to a coordinate cache."""
+		return cls.pattern.search(fn)!=None
+
+	def stamp(self):
+		return dict([(fn,[os.path.getsize(fn),os.path.getmtime(fn)])
+			for fn in [self.structure]+self.trajectories])
+
+	def valid(self):
+		"""Check that the cache is complete and matches the current trajectory."""
+		if not all([os.path.isfile(fn) for fn in self.files.values()]): return False
+		try:
+			with open(self.files['stamp']) as fp: return json.load(fp)['sources']==self.stamp()
+		except: return False
+
+	def build(self,universe):
+		"""Unpack every frame of a Universe into the cache."""
+		import numpy as np
+		# the stamp goes first so nobody uses the old files while we replace them
+		if os.path.isfile(self.files['stamp']): os.remove(self.files['stamp'])
+		traj = universe.trajectory
+		shape = (len(traj),len(universe.atoms),3)
+		status('building a coordinate cache with %d frames at %s'%(shape[0],self.files['coords']),tag='cache')
+		# parallel jobs may build the same cache so each one writes its own files and renames them
+		tmp = dict([(key,'%s.%d.tmp'%(self.files[key],os.getpid())) for key in self.files])
+		coords = np.lib.format.open_memmap(tmp['coords'],mode='w+',dtype=np.float32,shape=shape)
+		boxes = np.lib.format.open_memmap(tmp['boxes'],mode='w+',dtype=np.float32,shape=(shape[0],6))
+		for fr,ts in enumerate(traj):
+			coords[fr] = universe.atoms.positions
+			boxes[fr] = ts.dimensions
+		coords.flush()
+		boxes.flush()
+		del coords,boxes
+		with open(tmp['stamp'],'w') as fp:
+			json.dump({'sources':self.stamp(),'shape':list(shape)},fp)
+		for key in ['coords','boxes','stamp']: os.rename(tmp[key],self.files[key])
+
+	def load(self):
+		"""Map the coordinates and box dimensions read-only."""
+		import numpy as np
+		return np.load(self.files['coords'],mmap_mode='r'),np.load(self.files['boxes'],mmap_mode='r')
+
+	def purge(self):
+		for fn in self.files.values():
+			if os.path.isfile(fn): os.remove(fn)
+
+	@classmethod
+	def purge_all(cls,where):
+		"""Remove every coordinate cache in a folder and return the files removed."""
+		fns = [fn for fn in glob.glob(os.path.join(where,'*')) if cls.owns(fn)]
+		for fn in fns: os.remove(fn)
+		return fns
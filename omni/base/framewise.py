@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""
+Framewise-separable calculations.
+A calculation is framewise separable when each frame contributes only to its own rows of the result, so
+the result for a range of frames is the concatenation of the results for any split of that range.
+"""
+
+def framewise(function=None,constant=None):
+	"""
+	Declare a calculation framewise separable. Use it as @framewise or @framewise(constant=['resnames']).
+	Every array in the result must have the frame axis first except the constant ones, which must be
+	identical for every range of frames. The calculation must walk the trajectory with kwargs['reader']
+	since omnicalc restricts the frames by setting the window on the reader.
+	"""
+	def decorate(function):
+		function.framewise = {'constant':list(constant or [])}
+		return function
+	if function is None: return decorate
+	else: return decorate(function)
+
+def framewise_spec(function):
+	"""Return the framewise declaration for a calculation function or None."""
+	return getattr(function,'framewise',None)
+
+def count_frames(data,constant=()):
+	"""Number of frames in a result from the first array with a frame axis."""
+	for key,val in sorted(data.items()):
+		if key not in constant and getattr(val,'ndim',0)>0: return len(val)
+	return None
+
+def merge_framewise(parts,keys,constant=()):
+	"""
+	Concatenate the results for consecutive ranges of frames.
+	The parts are dictionaries ordered by frame and the keys are the arrays to merge.
+	"""
+	import numpy as np
+	merged = {}
+	for key in keys:
+		missing = [pnum for pnum,part in enumerate(parts) if key not in part]
+		if missing: raise Exception('cannot merge framewise results because %s is missing'%key)
+		if key in constant:
+			if not all([np.array_equal(parts[0][key],part[key]) for part in parts[1:]]):
+				raise Exception('constant array %s differs between framewise results'%key)
+			merged[key] = parts[-1][key]
+		else: merged[key] = np.concatenate([np.array(part[key]) for part in parts])
+	return merged
+
+def partition_window(n_frames,part,parts):
+	"""The (start,stop,step) window for one of several equal ranges of frames."""
+	return (n_frames*part//parts,n_frames*(part+1)//parts,None)
+
+def save_partition(fn,result,attrs):
+	"""
+	Store the result for one range of frames. The attributes and the names of the arrays are kept in the
+	attributes of the file so they can be separated again, and the file is renamed into place once it is
+	complete so an interrupted job never leaves a partial file behind.
+	"""
+	import os
+	from base.store import store
+	tmp = '%s.%d.tmp'%(fn,os.getpid())
+	if os.path.isfile(tmp): os.remove(tmp)
+	store(obj=result,name=os.path.basename(tmp),path=os.path.dirname(tmp),
+		attrs={'partition':dict(keys=list(result.keys()),attrs=attrs)},verbose=False)
+	os.rename(tmp,fn)
+
+def load_partition(fn):
+	"""Load the result and attributes for one range of frames."""
+	import os
+	from base.store import load
+	data = load(os.path.basename(fn),cwd=os.path.dirname(fn))
+	details = data.pop('partition')
+	return dict([(key,data[key]) for key in details['keys']]),details['attrs']
+
+def subset_window(outer,inner):
+	"""
+	The (start,stop,step) window for the frames of a slice which also belong to a slice inside it, or None.
+	Slices have frames at start, start+skip and so on up to end, so the inner slice must start on a frame of
+	the outer slice, end before it, and skip a multiple of its skip.
+	"""
+	def ratio(a,b):
+		value = float(a)/b
+		return int(round(value)) if abs(value-round(value))<1e-6 else None
+	try: (s1,e1,k1),(s2,e2,k2) = [[float(d[k]) for k in ['start','end','skip']] for d in [outer,inner]]
+	except (KeyError,TypeError,ValueError): return None
+	if (s1,e1,k1)==(s2,e2,k2) or k1<=0 or k2<=0 or s2<s1 or e2>e1 or e2<s2: return None
+	offset,step = ratio(s2-s1,k1),ratio(k2,k1)
+	if offset==None or not step: return None
+	count = int((e2-s2)/k2+1e-6)+1
+	return (offset,offset+(count-1)*step+1,step)
+
+def subsample_framewise(data,window,constant=()):
+	"""
+	Select a window of frames from a loaded result. Arrays are the result and the other items are the
+	attributes, since the attributes are stored as JSON.
+	"""
+	start,stop,step = window
+	result,attrs = {},{}
+	for key,val in data.items():
+		if not hasattr(val,'ndim'): attrs[key] = val
+		elif key in constant or val.ndim==0: result[key] = val
+		else: result[key] = val[start:stop:step]
+	return result,attrs
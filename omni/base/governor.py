@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+Resource governor.
+The compute loop owns the core budget and divides it between parallel jobs, the joblib workers inside each
+job, and the threads used by BLAS and OpenMP so that nested parallelism never oversubscribes the node.
+"""
+
+import os,math
+from base.tools import status
+from base.scheduler import read_first
+
+# environment variables read by BLAS and OpenMP libraries when they are loaded
+thread_variables = ['OMP_NUM_THREADS','OPENBLAS_NUM_THREADS','MKL_NUM_THREADS',
+	'VECLIB_MAXIMUM_THREADS','NUMEXPR_NUM_THREADS','BLIS_NUM_THREADS']
+
+def usable_cores():
+	"""Cores available to this process from the CPU affinity mask and the cgroup CPU quota."""
+	if hasattr(os,'sched_getaffinity'): cores = len(os.sched_getaffinity(0))
+	else:
+		import multiprocessing
+		cores = multiprocessing.cpu_count()
+	# cgroup v2 writes "quota period" or "max period" while v1 splits them and uses -1 for no quota
+	quota,period = None,None
+	line = read_first(['/sys/fs/cgroup/cpu.max'])
+	if line and line.split()[0]!='max': quota,period = [int(i) for i in line.split()[:2]]
+	else:
+		v1_quota = read_first(['/sys/fs/cgroup/cpu/cpu.cfs_quota_us','/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us'])
+		v1_period = read_first(['/sys/fs/cgroup/cpu/cpu.cfs_period_us',
+			'/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us'])
+		if v1_quota and v1_period and int(v1_quota)>0: quota,period = int(v1_quota),int(v1_period)
+	if quota and period: cores = min(cores,int(math.ceil(float(quota)/period)))
+	return max(1,cores)
+
+def limit_threads(threads):
+	"""
+	Limit the BLAS and OpenMP thread pools in this process. Libraries which are already loaded only
+	respond to threadpoolctl, while the environment variables reach any process started from this one.
+	Returns the threadpoolctl limiter which can restore the original limits, if threadpoolctl is installed.
+	"""
+	for key in thread_variables: os.environ[key] = str(threads)
+	try: from threadpoolctl import threadpool_limits
+	except ImportError: return None
+	return threadpool_limits(limits=threads)
+
+class ResourceGovernor:
+	"""
+	Divide the usable cores between the jobs in a compute run.
+	Each job receives an allotment of cores which calculations see as work.nprocs. The job process limits
+	BLAS and OpenMP to its allotment, and the workers it starts (e.g. with joblib) get one thread each.
+	"""
+	def __init__(self,jobs=1,cores=None,blas_threads=None):
+		self.cores = int(cores) if cores else usable_cores()
+		self.jobs = max(1,int(jobs))
+		self.allotment = max(1,self.cores//self.jobs)
+		self.blas_threads = int(blas_threads) if blas_threads else self.allotment
+
+	def report(self):
+		status('dividing %d cores between %d jobs with %d cores each'%(
+			self.cores,self.jobs,self.allotment),tag='governor')
+		if self.jobs>self.cores: status('running %d jobs on %d cores oversubscribes the node'%(
+			self.jobs,self.cores),tag='warning')
+
+	def enter(self,workspace):
+		"""Apply the allotment in the process which runs a job."""
+		workspace.nprocs = self.allotment
+		# serial jobs run in the parent so we save the environment to restore it on exit
+		self.environ = dict([(key,os.environ.get(key,None)) for key in thread_variables])
+		self.limiter = limit_threads(self.blas_threads)
+		# processes started by the job divide its allotment so they only need one thread each
+		for key in thread_variables: os.environ[key] = '1'
+		return self.limiter!=None
+
+	def exit(self):
+		"""Restore the thread limits and the environment from before the job."""
+		if getattr(self,'limiter',None): self.limiter.restore_original_limits()
+		for key,value in getattr(self,'environ',{}).items():
+			if value==None: os.environ.pop(key,None)
+			else: os.environ[key] = value
+		self.limiter,self.environ = None,{}
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Job history.
+Completed jobs are recorded in a local store in the post spot so the scheduler can estimate costs.
+"""
+
+import os,json,time
+
+class JobHistory:
+	"""
+	Record wall time, frames, and atoms for completed jobs and estimate the cost of new ones.
+	The cost model is a per-calculation rate in seconds per atom-frame.
+	"""
+	# keep only the most recent records for each calculation
+	max_records = 50
+	# fallback rate (seconds per atom-frame) when there is no history at all
+	default_rate = 1e-6
+	# fixed overhead for each job in seconds
+	overhead = 1.0
+
+	def __init__(self,fn):
+		self.fn = fn
+		self.toc = self.read()
+
+	def read(self):
+		if not os.path.isfile(self.fn): return {}
+		try:
+			with open(self.fn) as fp: return json.load(fp)
+		# the history is advisory so a corrupted file only costs us the estimates
+		except: return {}
+
+	def record(self,calc,wall,frames=None,atoms=None,**extras):
+		"""Add a completed job to the history and write it immediately."""
+		entry = dict(wall=wall,frames=frames,atoms=atoms,when=time.time(),**extras)
+		# reread before writing since other runs may share the post spot
+		self.toc = self.read()
+		self.toc[calc] = (self.toc.get(calc,[])+[entry])[-self.max_records:]
+		with open(self.fn+'.tmp','w') as fp: json.dump(self.toc,fp)
+		os.rename(self.fn+'.tmp',self.fn)
+
+	@staticmethod
+	def size(frames,atoms): return float(frames if frames else 1)*float(atoms if atoms else 1)
+
+	@staticmethod
+	def median(values):
+		values = sorted(values)
+		if not values: return None
+		mid = len(values)//2
+		return values[mid] if len(values)%2 else 0.5*(values[mid-1]+values[mid])
+
+	def rate(self,calc=None):
+		"""Median seconds per atom-frame for one calculation or for all of them."""
+		records = self.toc.get(calc,[]) if calc else [i for j in self.toc.values() for i in j]
+		return self.median([max(r['wall']-self.overhead,0.)/self.size(r['frames'],r['atoms'])
+			for r in records])
+
+	def typical(self,calc,key):
+		"""Median of a recorded quantity e.g. write_bytes for one calculation."""
+		return self.median([r[key] for r in self.toc.get(calc,[]) if r.get(key,None)!=None])
+
+	def peak_memory(self,calc):
+		"""
+		Typical peak memory for one calculation in bytes.
+		The traced peak belongs to the job alone so we prefer it to the high-water mark of the process.
+		"""
+		peak = self.typical(calc,'peak_traced')
+		return peak if peak!=None else self.typical(calc,'peak_rss')
+
+	def estimate(self,calc,frames=None,atoms=None):
+		"""
+		Estimate the wall time for a job. Returns the estimate and whether the calculation has history.
+		Unseen calculations use the median rate across all calculations as a size-based heuristic.
+		"""
+		rate = self.rate(calc)
+		known = rate!=None
+		if not known: rate = self.rate()
+		if rate==None: rate = self.default_rate
+		return self.overhead+rate*self.size(frames,atoms),known
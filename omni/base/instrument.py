@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""
+Resource instrumentation for compute jobs.
+Each job records wall and CPU time, peak memory, I/O, and the time spent in each phase of run_job.
+"""
+
+import os,sys,json,time,resource,tracemalloc
+from contextlib import contextmanager
+
+def read_proc_io():
+	"""Read the I/O counters for this process. Returns an empty dictionary where /proc is unavailable."""
+	try:
+		with open('/proc/self/io') as fp:
+			return dict([(k.strip(),int(v)) for k,v in [i.split(':') for i in fp.read().splitlines() if i]])
+	except: return {}
+
+def cpu_time():
+	"""User and system time for this process and its reaped children."""
+	return sum([getattr(resource.getrusage(who),key)
+		for who in [resource.RUSAGE_SELF,resource.RUSAGE_CHILDREN] for key in ['ru_utime','ru_stime']])
+
+def peak_rss():
+	"""High-water mark of the resident set size for this process in bytes."""
+	maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# linux reports kilobytes while macos reports bytes
+	return maxrss if sys.platform=='darwin' else maxrss*1024
+
+class JobMonitor:
+	"""
+	Measure the resources used by a single job.
+	Use the phase context manager to split the wall time across the steps of the job. A job which raises
+	never reaches stop, so whoever runs the job calls release afterwards to end its tracing.
+	"""
+	# the monitor which started tracemalloc in this process
+	tracer = None
+
+	def __init__(self,trace=True):
+		self.trace = trace
+		self.phases = {}
+
+	def start(self):
+		self.start_time = time.time()
+		self.start_cpu = cpu_time()
+		self.start_io = read_proc_io()
+		# tracemalloc gives a peak for this job alone whereas ru_maxrss is a high-water mark for the process
+		self.tracing = self.trace and not tracemalloc.is_tracing()
+		if self.tracing: 
+			tracemalloc.start()
+			JobMonitor.tracer = self
+		return self
+
+	@contextmanager
+	def phase(self,name):
+		start = time.time()
+		try: yield
+		finally: self.phases[name] = self.phases.get(name,0.)+time.time()-start
+
+	@classmethod
+	def release(cls):
+		"""Stop the tracing started by a monitor in this process, if any."""
+		if cls.tracer is None: return
+		cls.tracer = None
+		if tracemalloc.is_tracing(): tracemalloc.stop()
+
+	def stop(self):
+		"""Return the resource figures for this job."""
+		io = read_proc_io()
+		figures = dict(wall=time.time()-self.start_time,cpu=cpu_time()-self.start_cpu,
+			peak_rss=peak_rss(),phases=dict(self.phases))
+		if self.tracing:
+			figures['peak_traced'] = tracemalloc.get_traced_memory()[1]
+			self.release()
+		if io and self.start_io:
+			figures['read_bytes'] = io['read_bytes']-self.start_io['read_bytes']
+			figures['write_bytes'] = io['write_bytes']-self.start_io['write_bytes']
+		return figures
+
+class RunLog:
+	"""
+	Append-only log of completed jobs and their resources, one JSON object per line.
+	"""
+	def __init__(self,fn): self.fn = fn
+
+	def append(self,**entry):
+		entry['when'] = time.time()
+		with open(self.fn,'a') as fp: fp.write(json.dumps(entry)+'\n')
+
+	def read(self):
+		if not os.path.isfile(self.fn): return []
+		with open(self.fn) as fp:
+			entries = []
+			for line in fp:
+				# a partially written line from an interrupted run is skipped
+				try: entries.append(json.loads(line))
+				except: pass
+			return entries
+
+	def summarize(self):
+		"""Aggregate the resources by calculation."""
+		by_calc = {}
+		for entry in self.read():
+			if 'resources' not in entry: continue
+			by_calc.setdefault(entry['calc'],[]).append(entry['resources'])
+		summary = {}
+		for calc,items in by_calc.items():
+			mean = lambda key:sum([i.get(key,0) for i in items])/float(len(items))
+			phases = {}
+			for i in items:
+				for key,val in i.get('phases',{}).items(): phases[key] = phases.get(key,0.)+val
+			total = sum(phases.values())
+			summary[calc] = {
+				'jobs':len(items),
+				'wall total (s)':round(sum([i['wall'] for i in items]),1),
+				'wall mean (s)':round(mean('wall'),1),
+				'cpu mean (s)':round(mean('cpu'),1),
+				'peak rss max (MB)':round(max([i.get('peak_rss',0) for i in items])/2.**20,1),
+				'peak traced max (MB)':round(max([i.get('peak_traced',0) for i in items])/2.**20,1),
+				'read total (MB)':round(sum([i.get('read_bytes',0) for i in items])/2.**20,1),
+				'written total (MB)':round(sum([i.get('write_bytes',0) for i in items])/2.**20,1),
+				'phases (%)':dict([(key,round(100.*val/total,1) if total else 0.)
+					for key,val in phases.items()])}
+		return summary
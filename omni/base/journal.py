@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""
+Write-ahead journal for the compute loop.
+Names for new results are reserved in an append-only journal in the post spot instead of writing a
+placeholder dat and spec file for every pending job, so only completed results appear as files.
+"""
+
+import os,re,json,time,collections
+
+def result_name(dat_fn):
+	"""The name of a result in the journal is the basename of its dat/spec pair."""
+	return re.sub(r'\.dat$','',os.path.basename(dat_fn))
+
+class Journal:
+	"""
+	One JSON event per line for each result name. Names are reserved with the spec for the result and
+	later completed, failed, or rolled back. Replaying the journal gives the last state and the spec for
+	every name. Reserved and failed names are incomplete and are recovered by the next run.
+	"""
+	incomplete_states = ['reserved','failed']
+
+	def __init__(self,fn): 
+		self.fn = fn
+		# names with events from this process in the order they were written
+		self.written = []
+
+	def append(self,entries):
+		"""Append events with a single write so many reservations cost one synchronous write."""
+		if not entries: return
+		now = time.time()
+		text = ''.join([json.dumps(dict(entry,when=now))+'\n' for entry in entries])
+		with open(self.fn,'a') as fp:
+			fp.write(text)
+			fp.flush()
+			os.fsync(fp.fileno())
+		self.written.extend([entry['name'] for entry in entries])
+
+	def record(self,name,state,**details): self.append([dict(name=name,state=state,**details)])
+
+	def reserve(self,results):
+		"""Reserve the names for a list of new PostData objects."""
+		self.append([dict(name=result_name(r.files['dat']),state='reserved',specs=r.specs)
+			for r in results])
+
+	def replay(self):
+		"""Return the last state of every name in the order they were reserved."""
+		names = collections.OrderedDict()
+		if not os.path.isfile(self.fn): return names
+		with open(self.fn) as fp:
+			for line in fp:
+				# a partially written line from an interrupted run is skipped
+				try: entry = json.loads(line)
+				except: continue
+				this = names.setdefault(entry['name'],{})
+				this.update(**entry)
+		return names
+
+	def incomplete(self):
+		return collections.OrderedDict([(k,v) for k,v in self.replay().items()
+			if v['state'] in self.incomplete_states])
+
+	def recoverable(self,where):
+		"""
+		Split the incomplete names into those which were stored in the post spot before the run was
+		interrupted and those which are still pending. Nothing is written so this is safe on a dry run.
+		"""
+		pending,stored = collections.OrderedDict(),collections.OrderedDict()
+		for name,entry in self.incomplete().items():
+			if os.path.isfile(os.path.join(where,'%s.dat'%name)): stored[name] = entry
+			else: pending[name] = entry
+		return pending,stored
+
+	def recover(self,where):
+		"""
+		Complete the journal for results which were stored before the run was interrupted.
+		Dat files are only moved into the post spot once they are complete, so a dat file without its spec
+		file only needs the spec from the journal. Returns the names which are still incomplete.
+		"""
+		pending,stored = self.recoverable(where)
+		recovered = []
+		for name,entry in stored.items():
+			spec_fn = os.path.join(where,'%s.spec'%name)
+			if not os.path.isfile(spec_fn):
+				entry['specs']['meta'].pop('failed',None)
+				with open(spec_fn+'.tmp','w') as fp: fp.write(json.dumps(entry['specs']))
+				os.rename(spec_fn+'.tmp',spec_fn)
+			recovered.append(dict(name=name,state='completed',recovered=True))
+		self.append(recovered)
+		return pending
+
+	def compact(self):
+		"""
+		Rewrite the journal without the completed names, which are files in the post spot.
+		Rolled back names stay so their numbers are never reused.
+		"""
+		names = self.replay()
+		kept = [entry for entry in names.values() if entry['state']!='completed']
+		if len(kept)==len(names): return
+		with open(self.fn+'.tmp','w') as fp:
+			for entry in kept: fp.write(json.dumps(entry)+'\n')
+		os.rename(self.fn+'.tmp',self.fn)
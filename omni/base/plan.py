@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+Incremental planning.
+The result names from the last run are saved with a digest of the inputs to each calculation, so an
+unchanged calculation is matched with its results by name and a run with no changes can stop before it
+reads the post spot.
+"""
+
+import os,json,hashlib
+
+def digest(obj):
+	"""Stable digest of a JSON-compatible object."""
+	return hashlib.sha1(json.dumps(obj,sort_keys=True,default=str).encode()).hexdigest()
+
+def job_key(job):
+	"""Identify a job within its calculation by the expanded specs and the simulation."""
+	return digest(dict(specs=job.calc.specs,sn=job.slice.data['sn']))[:16]
+
+class PlanCache:
+	"""
+	Calculations from the last run with the digest of their inputs and the result name for each job.
+	Only calculations with a result for every job are saved.
+	"""
+	def __init__(self,fn):
+		self.fn = fn
+		self.calcs = {}
+		if os.path.isfile(fn):
+			# a damaged plan only means we plan from scratch
+			try:
+				with open(fn) as fp: self.calcs = json.load(fp)['calcs']
+			except: self.calcs = {}
+
+	def result(self,job,digest):
+		"""The name of the result for a job from the last run if its calculation is unchanged."""
+		entry = self.calcs.get(job.calc.name,{})
+		if entry.get('digest',None)!=digest: return None
+		return entry['results'].get(job_key(job),None)
+
+	def complete(self,jobs,digests,where):
+		"""
+		Check that no calculation changed since the last run and every job still has its files.
+		"""
+		if set(digests.keys())!=set([k for k in self.calcs]): return False
+		if any([self.calcs[k]['digest']!=v for k,v in digests.items()]): return False
+		for job in jobs:
+			name = self.result(job,digests[job.calc.name])
+			if not name or not all([os.path.isfile(os.path.join(where,'%s.%s'%(name,suffix)))
+				for suffix in ['dat','spec']]): return False
+		return True
+
+	def save(self,calcs):
+		"""Save a dictionary of calculation names to their digest and their results by job key."""
+		self.calcs = calcs
+		with open(self.fn+'.tmp','w') as fp: json.dump({'calcs':calcs},fp)
+		os.rename(self.fn+'.tmp',self.fn)
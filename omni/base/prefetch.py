@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+Background prefetch for the compute loop.
+Upstream data for the next jobs are loaded into the run cache while the current job computes.
+"""
+
+import os,threading
+from contextlib import contextmanager
+from base.tools import status
+
+def warm_file(fn):
+	"""Ask the kernel to read a file into the page cache without waiting for it."""
+	if not hasattr(os,'posix_fadvise') or not os.path.isfile(fn): return
+	fd = os.open(fn,os.O_RDONLY)
+	try: os.posix_fadvise(fd,0,0,os.POSIX_FADV_WILLNEED)
+	finally: os.close(fd)
+
+class Prefetcher:
+	"""
+	Load upstream data for upcoming jobs into an UpstreamCache from a background thread.
+	Files are only prefetched when their upstream job is complete and when they fit in the memory bound
+	alongside everything else in the cache. The optional slice_files function returns the structure and
+	trajectory files for a job so they can be warmed in the page cache.
+	"""
+	def __init__(self,cache,memory=2**30,depth=1,slice_files=None):
+		self.cache = cache
+		self.memory = memory
+		self.depth = depth
+		self.slice_files = slice_files
+		self.queue,self.warmed = [],set()
+		self.wake,self.halt = threading.Event(),threading.Event()
+		# held while reading the cache so the scheduler can fork without copying a half-finished read or a
+		# ... held cache lock
+		self.busy = threading.Lock()
+		self.thread = threading.Thread(target=self.loop)
+		self.thread.daemon = True
+
+	def start(self):
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.halt.set()
+		self.wake.set()
+		self.thread.join()
+
+	def upcoming(self,jobs):
+		"""Tell the prefetcher which jobs are likely to start next, in order."""
+		self.queue = list(jobs)[:self.depth]
+		self.wake.set()
+
+	@contextmanager
+	def pause(self):
+		"""Wait for any read in progress and hold off new ones."""
+		with self.busy: yield
+
+	def loop(self):
+		while not self.halt.is_set():
+			self.wake.wait()
+			self.wake.clear()
+			try: self.prefetch(self.queue)
+			# prefetching is an optimization so a failure only means the job loads its own data
+			except Exception as e: status('prefetch failed: %s'%e,tag='warning')
+
+	def prefetch(self,jobs):
+		for job in jobs:
+			# the checks take the cache lock too so the scheduler never forks while this thread holds it
+			with self.busy:
+				if self.halt.is_set() or self.wake.is_set(): return
+				# fused jobs carry their members and only simulation calculations read the slice
+				if (self.slice_files and hasattr(job,'slice_upstream') and any([
+					j.calc.raw.get('uptype',None)=='simulation' for j in getattr(job,'jobs',[job])])):
+					struct_file,traj_file = self.slice_files(job)
+					for fn in [struct_file]+(traj_file if isinstance(traj_file,list) else [traj_file]):
+						if fn not in self.warmed:
+							warm_file(fn)
+							self.warmed.add(fn)
+				for up in job.upstream.values():
+					fn = up.result.files['dat']
+					# upstream jobs which are still pending have nothing to read yet
+					if up.result.style!='read' or self.cache.has(fn) or not self.cache.needed(fn): continue
+					# stop at the first file that does not fit so we never skip ahead of the queue order
+					if self.cache.nbytes()+os.path.getsize(fn)>self.memory: return
+					if self.halt.is_set(): return
+					self.cache.fetch(fn)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+"""
+Job scheduler for the compute loop.
+Pending jobs are dispatched in dependency order with the longest expected chains first.
+"""
+
+import os,sys,time,traceback
+from base.tools import status
+
+def format_seconds(seconds):
+	"""Readable durations for the makespan estimate."""
+	if seconds<120: return '%.1f seconds'%seconds
+	elif seconds<7200: return '%.1f minutes'%(seconds/60.)
+	else: return '%.1f hours'%(seconds/3600.)
+
+def format_bytes(nbytes):
+	"""Readable memory sizes for the admission report."""
+	for scale,unit in [(2**30,'GB'),(2**20,'MB'),(2**10,'KB')]:
+		if nbytes>=scale: return '%.1f %s'%(nbytes/float(scale),unit)
+	return '%d bytes'%nbytes
+
+def read_first(fns):
+	"""Read the first line of the first readable file in a list."""
+	for fn in fns:
+		try:
+			with open(fn) as fp: return fp.readline().strip()
+		except: pass
+	return None
+
+def available_memory():
+	"""
+	Memory available to this process in bytes from /proc/meminfo and the cgroup limit if any.
+	Returns None when neither source is readable.
+	"""
+	candidates = []
+	try:
+		with open('/proc/meminfo') as fp:
+			for line in fp:
+				if line.startswith('MemAvailable:'): candidates.append(int(line.split()[1])*1024)
+	except: pass
+	# cgroup v2 writes "max" when there is no limit while v1 writes a very large number
+	limit = read_first(['/sys/fs/cgroup/memory.max','/sys/fs/cgroup/memory/memory.limit_in_bytes'])
+	usage = read_first(['/sys/fs/cgroup/memory.current','/sys/fs/cgroup/memory/memory.usage_in_bytes'])
+	if limit and limit.isdigit() and int(limit)<2**60:
+		candidates.append(int(limit)-(int(usage) if usage and usage.isdigit() else 0))
+	return min(candidates) if candidates else None
+
+def memory_budget(setting=None):
+	"""
+	Interpret the compute_memory setting. Values up to one are a fraction of the available memory
+	and larger values are bytes. The default is 80% of the available memory.
+	"""
+	setting = 0.8 if setting==None else float(setting)
+	if setting>1: return int(setting)
+	available = available_memory()
+	return int(setting*available) if available else None
+
+def describe(job):
+	"""Name a job by its calculation or the calculations in a fused job."""
+	return ','.join([j.calc.name for j in getattr(job,'jobs',[job])])
+
+class JobScheduler:
+	"""
+	Dispatch pending jobs to a number of workers.
+	A single worker runs jobs in this process. Otherwise each job runs in a forked child process.
+	Parallel jobs are only admitted while the sum of their expected peak memory fits in the budget.
+	"""
+	def __init__(self,jobs,estimate,workers=1,memory=None,budget=None):
+		self.jobs = list(jobs)
+		self.owners = dict([(id(member),job) for job in self.jobs for member in getattr(job,'jobs',[])])
+		self.workers = max(1,int(workers))
+		# the estimate function returns the expected wall time and whether it came from history
+		self.estimates,self.known = {},{}
+		for job in self.jobs: self.estimates[id(job)],self.known[id(job)] = estimate(job)
+		# the memory function returns the expected peak memory of a job in bytes or None if unknown
+		self.budget = budget
+		self.memory = dict([(id(j),(memory(j) if memory else None) or 0) for j in self.jobs])
+		self.priority = self.critical_paths()
+
+	def upstream(self,job):
+		"""Pending jobs that must finish before this job can start."""
+		pending = set([id(j) for j in self.jobs])
+		# members of fused jobs are represented by the fused job
+		owners = [self.owners.get(id(j),j) for j in getattr(job,'upstream',{}).values()]
+		return [j for j in owners if id(j) in pending]
+
+	def critical_paths(self):
+		"""
+		Rank each job by its own cost plus the longest chain of pending jobs downstream of it.
+		For independent jobs this reduces to longest-expected-first.
+		"""
+		downstream = dict([(id(j),[]) for j in self.jobs])
+		for job in self.jobs:
+			for up in self.upstream(job): downstream[id(up)].append(job)
+		ranks = {}
+		def rank(job):
+			if id(job) not in ranks:
+				ranks[id(job)] = self.estimates[id(job)]+max([0.]+[rank(j) for j in downstream[id(job)]])
+			return ranks[id(job)]
+		for job in self.jobs: rank(job)
+		return ranks
+
+	def levels(self):
+		"""Group jobs into dependency levels. Jobs in each level only depend on earlier levels."""
+		levels,toc = [],{}
+		def level(job):
+			if id(job) not in toc: toc[id(job)] = 1+max([-1]+[level(u) for u in self.upstream(job)])
+			return toc[id(job)]
+		for job in self.jobs:
+			while len(levels)<=level(job): levels.append([])
+			levels[level(job)].append(job)
+		return levels
+
+	def ready(self,remaining,done):
+		"""Jobs whose pending upstream jobs are complete, highest priority first."""
+		jobs = [j for j in remaining if all([id(u) in done for u in self.upstream(j)])]
+		return sorted(jobs,key=lambda j:-self.priority[id(j)])
+
+	def oversize(self,job):
+		"""Jobs which cannot fit in the budget even when they run alone."""
+		return self.budget!=None and self.memory[id(job)]>self.budget
+
+	def admit(self,ready,running):
+		"""
+		Choose the next job to start given the ready jobs and the running ones or return None.
+		Smaller jobs may start ahead of a job which does not fit yet, but an oversize job at the front
+		of the queue waits for the running jobs to finish and then runs by itself.
+		"""
+		if not ready: return None
+		if self.budget==None: return ready[0]
+		if any([self.oversize(j) for j in running]): return None
+		if self.oversize(ready[0]): return ready[0] if not running else None
+		used = sum([self.memory[id(j)] for j in running])
+		for job in ready:
+			if not self.oversize(job) and used+self.memory[id(job)]<=self.budget: return job
+		return None
+
+	def makespan(self):
+		"""Simulate the schedule with the estimates to predict the total wall time."""
+		remaining,done,finish = list(self.jobs),set(),{}
+		slots = [0.]*self.workers
+		while remaining:
+			ready = self.ready(remaining,done)
+			if not ready: raise Exception('cannot schedule jobs with unmet dependencies')
+			job = ready[0]
+			slot = slots.index(min(slots))
+			begin = max([slots[slot]]+[finish[id(u)] for u in self.upstream(job)])
+			finish[id(job)] = slots[slot] = begin+self.estimates[id(job)]
+			remaining.remove(job)
+			done.add(id(job))
+		return max(slots)
+
+	def report(self):
+		"""Print the expected makespan before the run."""
+		nknown = sum([1 for j in self.jobs if self.known[id(j)]])
+		makespan = self.makespan()
+		status('estimated makespan is %s for %d jobs on %d workers (%d/%d estimates from history)'%(
+			format_seconds(makespan),len(self.jobs),self.workers,nknown,len(self.jobs)),tag='schedule')
+		if self.workers>1 and self.budget!=None:
+			oversize = [j for j in self.jobs if self.oversize(j)]
+			status('admitting parallel jobs within a memory budget of %s%s'%(format_bytes(self.budget),
+				'' if not oversize else ' (%d jobs will run alone)'%len(oversize)),tag='schedule')
+		return makespan
+
+	def run(self,execute,complete,prefetch=None,fail=None,keep_going=False):
+		"""
+		Run every job. The execute function runs one job and returns a report for the complete function,
+		which always runs in this process. The optional prefetcher hears about the upcoming jobs.
+		Failed jobs and the jobs downstream of them are sent to the fail function with the error. The run
+		stops dispatching after the first failure unless keep_going is set, in which case independent jobs
+		continue. Either way the run ends with a summary and an exception if anything failed.
+		"""
+		self.prefetch = prefetch
+		self.fail = fail
+		self.keep_going = keep_going
+		self.failures,self.skipped = [],[]
+		self.done = set()
+		if self.workers==1: self.run_serial(execute,complete)
+		else: self.run_forked(execute,complete)
+		self.summarize()
+
+	def upcoming(self,remaining,exclude=()):
+		"""Send the jobs which are likely to start next to the prefetcher."""
+		if not self.prefetch: return
+		jobs = sorted([j for j in remaining if id(j) not in exclude],key=lambda j:-self.priority[id(j)])
+		self.prefetch.upcoming(jobs)
+
+	def descendants(self,job,remaining):
+		"""Remaining jobs which depend on a job directly or indirectly."""
+		found,frontier = [],[job]
+		while frontier:
+			this = frontier.pop()
+			for other in remaining:
+				if other not in found and any([u is this for u in self.upstream(other)]):
+					found.append(other)
+					frontier.append(other)
+		return found
+
+	def failed(self,job,error,remaining):
+		"""
+		Record a failed job and remove its descendants from the remaining jobs.
+		"""
+		self.failures.append((job,error))
+		if self.fail: self.fail(job,error)
+		for other in self.descendants(job,remaining):
+			remaining.remove(other)
+			reason = 'skipped because upstream job %s failed'%describe(job)
+			self.skipped.append((other,reason))
+			if self.fail: self.fail(other,reason)
+
+	def summarize(self):
+		"""Report the failed and skipped jobs."""
+		if not self.failures: return
+		# a single failure that stopped the run gets the whole traceback
+		for job,error in self.failures: status('job %s failed: %s'%(describe(job),
+			error.strip().splitlines()[-1] if self.keep_going else error),tag='error')
+		for job,reason in self.skipped: status('job %s %s'%(describe(job),reason),tag='error')
+		# jobs which never started because the run stopped early are not counted as completed
+		unstarted = len(self.jobs)-len(self.done)-len(self.failures)-len(self.skipped)
+		raise Exception('%d jobs failed and %d were skipped (%d completed%s). '%(
+			len(self.failures),len(self.skipped),len(self.done),
+			', %d not started'%unstarted if unstarted else '')+
+			'see the run log for tracebacks. failed jobs are retried on the next run')
+
+	def run_serial(self,execute,complete):
+		remaining,done = list(self.jobs),self.done
+		jnum = 0
+		while remaining:
+			ready = self.ready(remaining,done)
+			if not ready: raise Exception('cannot schedule jobs with unmet dependencies')
+			job = ready[0]
+			self.upcoming(remaining,exclude=[id(job)])
+			remaining.remove(job)
+			try: report = execute(job,jnum)
+			except Exception as e:
+				self.failed(job,'%s\n%s'%(e,traceback.format_exc()),remaining)
+				if not self.keep_going: break
+			else:
+				complete(job,report)
+				done.add(id(job))
+			jnum += 1
+
+	def _child(self,execute,job,jnum,conn):
+		"""Run a job in a forked worker and send the report back to the parent."""
+		try:
+			conn.send({'report':execute(job,jnum)})
+			code = 0
+		except BaseException as e:
+			conn.send({'error':'%s\n%s'%(e,traceback.format_exc())})
+			code = 1
+		conn.close()
+		sys.stdout.flush()
+		os._exit(code)
+
+	def run_forked(self,execute,complete):
+		import multiprocessing
+		from multiprocessing.connection import wait
+		context = multiprocessing.get_context('fork')
+		remaining,done,running = list(self.jobs),self.done,{}
+		jnum = 0
+		while remaining or running:
+			# stop dispatching after a failure but let the running jobs finish unless we keep going
+			while (self.keep_going or not self.failures) and len(running)<self.workers:
+				ready = self.ready([j for j in remaining if id(j) not in running],done)
+				job = self.admit(ready,[job for proc,job,conn in running.values()])
+				if not job: break
+				conn_recv,conn_send = context.Pipe(duplex=False)
+				proc = context.Process(target=self._child,args=(execute,job,jnum,conn_send))
+				# never fork in the middle of a prefetch read
+				if self.prefetch:
+					with self.prefetch.pause(): proc.start()
+				else: proc.start()
+				conn_send.close()
+				running[id(job)] = (proc,job,conn_recv)
+				jnum += 1
+			if not running:
+				if self.failures: break
+				raise Exception('cannot schedule jobs with unmet dependencies')
+			self.upcoming(remaining,exclude=running)
+			# reports are read as soon as they arrive since a worker blocks on a report larger than the pipe
+			finished = wait([i for proc,job,conn in running.values() for i in [conn,proc.sentinel]])
+			for key,(proc,job,conn) in list(running.items()):
+				if conn not in finished and proc.sentinel not in finished: continue
+				try: message = conn.recv()
+				# a worker that dies without reporting was probably killed e.g. by the OOM killer
+				except EOFError: 
+					proc.join()
+					message = {'error':'worker exited with code %s'%proc.exitcode}
+				proc.join()
+				conn.close()
+				del running[key]
+				remaining.remove(job)
+				if 'error' in message: self.failed(job,message['error'],remaining)
+				else:
+					done.add(id(job))
+					complete(job,message['report'])
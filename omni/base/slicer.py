@@ -49,7 +49,8 @@ def make_slice_gromacs(**kwargs):
 		#import ipdb;ipdb.set_trace()
 		#---get the latest starting structure
 		#spec['tpr_keyfinder']('EGFR_active_L747P_MD_2', ('s', '01', 'protein'), '0001')
-		group_fn = create_group(postdir=kwargs['postdir'],structure=kwargs['last_structure'],**spec_group)
+		group_fn = create_group(postdir=kwargs['postdir'],structure=kwargs['last_structure'],
+			universes=kwargs.get('universes',None),selections=kwargs.get('selections',None),**spec_group)
 		spec['group_fn'] = group_fn
 	#---call the slice maker
 	slice_trajectory(**spec)
@@ -277,6 +278,9 @@ def create_group(**kwargs):
 	postdir = kwargs['postdir']
 	structure = kwargs['structure']
 	cols = 100 if 'cols' not in kwargs else kwargs['cols']
+	#---the workspace may send its universe and selection caches
+	universes = kwargs.get('universes',None)
+	selections = kwargs.get('selections',None)
 	#---naming convention holds that the group names follow the prefix and we suffix with ndx
 	fn = '%s.ndx'%simkey
 	fn_abs = os.path.join(postdir,fn)
@@ -285,9 +289,12 @@ def create_group(**kwargs):
 	#---! removed a self.confirm_file function from legacy omnicalc
 	print('[STATUS] creating group %s'%simkey)
 	#---read the structure
-	import MDAnalysis
-	uni = MDAnalysis.Universe(structure)
-	sel = uni.select_atoms(select)
+	if universes: uni = universes.get(structure)
+	else:
+		import MDAnalysis
+		uni = MDAnalysis.Universe(structure)
+	if selections: sel = selections.select(uni,structure,select)
+	else: sel = uni.select_atoms(select)
 	#---write NDX 
 	import numpy as np
 	iii = sel.indices+1	
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+
+"""
+Batched parameter sweeps.
+A loop in the calculation specs expands into one job per value. Calculations which accept a batch receive
+every expanded spec for a slice at once so they load upstream data and read the trajectory only once.
+"""
+
+def sweep(function):
+	"""
+	Declare that a calculation accepts a batch of sweep values. The calculation receives kwargs['batch'],
+	a list with one calc dictionary (with specs) per expanded spec, and returns a list with one
+	(result,attrs) pair per entry in the same order.
+	"""
+	function.sweep = True
+	return function
+
+def is_sweep(function):
+	"""Check if a calculation accepts a batch of sweep values."""
+	return getattr(function,'sweep',False)==True
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+"""
+Streaming trajectory reader.
+Calculations receive a TrajectoryReader from run_compute so they can walk a slice in blocks of frames
+instead of building their own MDAnalysis Universe and collecting every frame into lists.
+"""
+
+import os,threading
+try: import queue
+except: import Queue as queue
+from base.tools import status
+from base.coordinates import CoordinateCache
+
+class FrameBlock:
+	"""
+	A contiguous block of frames from a trajectory.
+	Coordinates have shape (n_frames,n_atoms,3) and dimensions have shape (n_frames,6).
+	"""
+	def __init__(self,frames,coords,dimensions):
+		self.frames = frames
+		self.coords = coords
+		self.dimensions = dimensions
+	def __len__(self): return len(self.frames)
+	@property
+	def start(self): return int(self.frames[0])
+	@property
+	def stop(self): return int(self.frames[-1])+1
+	@property
+	def vecs(self):
+		"""Box vectors in the style of the lipid_abstractor vecs."""
+		return self.dimensions[:,:3]
+
+class TrajectoryReader:
+	"""
+	Read a trajectory in fixed-size blocks of frames with bounded memory.
+	The Universe is only built on first use so that calculations which ignore the reader pay nothing.
+	"""
+	# default memory budget for all blocks in flight (current, queued, and being read)
+	memory = 2**28
+	def __init__(self,structure,trajectory,selection='all',**kwargs):
+		self.structure = structure
+		self.trajectory = trajectory
+		self.selection = selection
+		self.memory = kwargs.pop('memory',self.memory)
+		self.block_size = kwargs.pop('block_size',None)
+		self.prefetch = kwargs.pop('prefetch',True)
+		# the window restricts the reader to a (start,stop,step) range of frames in the slice
+		self.window = kwargs.pop('window',None)
+		self._universe = kwargs.pop('universe',None)
+		# optional caches shared with other readers in the same run
+		self.universes = kwargs.pop('universes',None)
+		self.selections = kwargs.pop('selections',None)
+		# read blocks from the memory-mapped coordinate cache next to the trajectory
+		self.coordinate_cache = kwargs.pop('coordinate_cache',False)
+		self._mapped = None
+		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
+		self._atoms = {}
+
+	@property
+	def universe(self):
+		if self._universe is None:
+			if self.universes: self._universe = self.universes.get(self.structure,self.trajectory)
+			else:
+				import MDAnalysis
+				self._universe = MDAnalysis.Universe(self.structure,self.trajectory)
+		return self._universe
+
+	def atoms(self,selection=None):
+		"""Get an atom group for a selection string. Selections are cached on the reader."""
+		selection = self.selection if selection==None else selection
+		# atom groups pass through so callers can read an arbitrary set of atoms
+		if hasattr(selection,'positions'): return selection
+		if selection not in self._atoms:
+			if self.selections: 
+				self._atoms[selection] = self.selections.select(self.universe,self.structure,selection)
+			else: self._atoms[selection] = self.universe.select_atoms(selection)
+		return self._atoms[selection]
+
+	@property
+	def n_atoms(self): return len(self.atoms())
+
+	def frame_range(self,start=None,stop=None,step=None):
+		"""Resolve a frame range against the window and the trajectory length."""
+		n_total = len(self.universe.trajectory)
+		if self.window:
+			w_start,w_stop,w_step = self.window
+			frames = range(n_total)[slice(w_start,w_stop,w_step)]
+		else: frames = range(n_total)
+		return frames[slice(start,stop,step)]
+
+	@property
+	def n_frames(self): return len(self.frame_range())
+
+	@property
+	def n_total(self):
+		"""Frames in the whole trajectory, counted without the topology if there is no Universe yet."""
+		if self._universe is not None: return len(self._universe.trajectory)
+		return count_trajectory_frames(self.trajectory)
+
+	def _block_size(self,n_atoms):
+		"""Choose a block size so that three blocks of float32 coordinates fit in the memory budget."""
+		if self.block_size: return self.block_size
+		return max(1,int(self.memory/(3*n_atoms*3*4)))
+
+	def coordinates(self,build=True):
+		"""
+		Map the coordinates and box dimensions for every frame of the trajectory from the coordinate cache.
+		The cache is built on first use unless build is False, in which case this returns None.
+		Frames are indexed by their position in the whole trajectory and atoms by their index.
+		"""
+		if self._mapped is None:
+			cache = CoordinateCache(self.structure,self.trajectory)
+			if not cache.valid():
+				if not build: return None
+				cache.build(self.universe)
+			self._mapped = cache.load()
+		return self._mapped
+
+	def _read_block(self,atoms,frames):
+		"""Read a list of frames into contiguous arrays."""
+		import numpy as np
+		if self.coordinate_cache:
+			coords,boxes = self.coordinates()
+			return FrameBlock(frames=np.array(frames),coords=np.array(coords[np.ix_(frames,atoms.indices)]),
+				dimensions=np.array(boxes[frames]))
+		coords = np.zeros((len(frames),len(atoms),3),dtype=np.float32)
+		dimensions = np.zeros((len(frames),6),dtype=np.float32)
+		traj = self.universe.trajectory
+		for ii,fr in enumerate(frames):
+			ts = traj[fr]
+			coords[ii] = atoms.positions
+			dimensions[ii] = ts.dimensions
+		return FrameBlock(frames=np.array(frames),coords=coords,dimensions=dimensions)
+
+	def _chunks(self,frames,size):
+		for ii in range(0,len(frames),size): yield list(frames[ii:ii+size])
+
+	def blocks(self,selection=None,start=None,stop=None,step=None,block_size=None,loud=True):
+		"""
+		Yield FrameBlock objects over a range of frames.
+		When prefetch is on, a background thread reads the next block while the caller works on this one.
+		"""
+		atoms = self.atoms(selection)
+		frames = self.frame_range(start=start,stop=stop,step=step)
+		size = block_size if block_size else self._block_size(len(atoms))
+		chunks = list(self._chunks(frames,size))
+		if not self.prefetch:
+			for cnum,chunk in enumerate(chunks):
+				if loud: status('reading frames %d-%d'%(chunk[0],chunk[-1]),
+					i=cnum,looplen=len(chunks),tag='read')
+				yield self._read_block(atoms,chunk)
+			return
+		# a queue of size one means at most three blocks are alive: yielded, queued, and being read
+		incoming = queue.Queue(maxsize=1)
+		halt = threading.Event()
+		def reader():
+			try:
+				for chunk in chunks:
+					if halt.is_set(): return
+					block = self._read_block(atoms,chunk)
+					while not halt.is_set():
+						try:
+							incoming.put(block,timeout=0.1)
+							break
+						except queue.Full: pass
+				incoming.put(None)
+			except Exception as e: incoming.put(e)
+		thread = threading.Thread(target=reader)
+		thread.daemon = True
+		thread.start()
+		try:
+			cnum = 0
+			while True:
+				block = incoming.get()
+				if block is None: break
+				elif isinstance(block,Exception): raise block
+				if loud: status('reading frames %d-%d'%(block.start,block.stop-1),
+					i=cnum,looplen=len(chunks),tag='read')
+				cnum += 1
+				yield block
+		finally:
+			# the caller may stop early so we release the reader thread
+			halt.set()
+			while thread.is_alive():
+				try: incoming.get_nowait()
+				except queue.Empty: pass
+				thread.join(0.1)
+
+	def __iter__(self): return self.blocks()
+
+def count_gro_atoms(fn):
+	"""Read the number of atoms from the header of a GRO file without parsing the coordinates."""
+	if not fn.endswith('.gro') or not os.path.isfile(fn): return None
+	with open(fn) as fp:
+		fp.readline()
+		try: return int(fp.readline().strip())
+		except: return None
+
+def count_trajectory_frames(trajectory):
+	"""
+	Count the frames in a trajectory or a list of trajectories with the MDAnalysis coordinate readers alone,
+	which skips the topology. XTC readers save their frame offsets so the next count is cheap.
+	"""
+	from MDAnalysis.coordinates.core import reader
+	total = 0
+	for fn in (trajectory if isinstance(trajectory,list) else [trajectory]):
+		traj = reader(fn)
+		total += traj.n_frames
+		traj.close()
+	return total
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Caches for MDAnalysis.
+Universes are shared by the jobs in a compute run and the atom indices for selections are saved in the
+post spot so that repeated selections on the same structure skip the selection parser.
+"""
+
+import os,re,hashlib,collections
+
+class UniverseCache:
+	"""
+	Keep the most recently used Universes keyed by structure and trajectory for the life of a run.
+	Calculations which share a Universe share its trajectory position, so they should always seek to the
+	frame they want rather than relying on the current one.
+	"""
+	def __init__(self,size=4):
+		self.size = size
+		self.toc = collections.OrderedDict()
+
+	def get(self,structure,trajectory=None):
+		"""Return a Universe for a structure and an optional trajectory or list of trajectories."""
+		key = (structure,tuple(trajectory) if isinstance(trajectory,list) else trajectory)
+		if key in self.toc:
+			self.toc[key] = self.toc.pop(key)
+			return self.toc[key]
+		import MDAnalysis
+		if trajectory==None: universe = MDAnalysis.Universe(structure)
+		else: universe = MDAnalysis.Universe(structure,trajectory)
+		self.toc[key] = universe
+		while len(self.toc)>self.size: self.toc.popitem(last=False)
+		return universe
+
+	def clear(self): self.toc.clear()
+
+class SelectionCache:
+	"""
+	Atom indices for selection strings saved as numpy files in a folder in the post spot.
+	Entries are keyed by a hash of the structure file and the selection string. Geometric selections
+	depend on the coordinates of the current frame, so they are never cached.
+	"""
+	geometric = re.compile(r'\b(around|sphlayer|sphzone|cylayer|cyzone|point|prop|isolayer|global)\b')
+
+	def __init__(self,path):
+		self.path = path
+		self.hashes = {}
+
+	def structure_hash(self,structure):
+		"""Hash the contents of a structure file once per modification time."""
+		stat = os.stat(structure)
+		key = (structure,stat.st_mtime,stat.st_size)
+		if key not in self.hashes:
+			digest = hashlib.sha1()
+			with open(structure,'rb') as fp:
+				for chunk in iter(lambda:fp.read(2**20),b''): digest.update(chunk)
+			self.hashes[key] = digest.hexdigest()
+		return self.hashes[key]
+
+	def filename(self,structure,selection):
+		return os.path.join(self.path,'%s.%s.npy'%(self.structure_hash(structure),
+			hashlib.sha1(selection.encode()).hexdigest()))
+
+	def indices(self,universe,structure,selection):
+		"""Get the atom indices for a selection from the cache or from the selection parser."""
+		import numpy as np
+		if self.geometric.search(selection): return universe.select_atoms(selection).indices
+		fn = self.filename(structure,selection)
+		if os.path.isfile(fn): return np.load(fn)
+		indices = universe.select_atoms(selection).indices
+		if not os.path.isdir(self.path): os.makedirs(self.path)
+		# write then rename so a parallel job never reads a partial file
+		tmp = '%s.%d.tmp'%(fn,os.getpid())
+		with open(tmp,'wb') as fp: np.save(fp,indices)
+		os.rename(tmp,fn)
+		return indices
+
+	def select(self,universe,structure,selection):
+		"""Return an atom group for a selection using the cached indices."""
+		if self.geometric.search(selection): return universe.select_atoms(selection)
+		return universe.atoms[self.indices(universe,structure,selection)]
+
+	def purge(self):
+		"""Remove every cached selection."""
+		if not os.path.isdir(self.path): return
+		for fn in os.listdir(self.path): os.remove(os.path.join(self.path,fn))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""
+Run-scoped cache of upstream results.
+Upstream data are kept in memory while pending jobs still need them so each dat file is read at most once
+per run, and results computed earlier in the same run are never read back from disk.
+"""
+
+import os,json,copy,threading
+from base.store import load
+
+class UpstreamCache:
+	"""
+	Hold upstream results keyed by their dat file.
+	Entries are reference-counted by the pending jobs which consume them and are evicted as soon as the
+	last consumer is released. Consumers share the cached arrays, which are read-only so that a calculation
+	which modifies its upstream data in place raises instead of changing them for the next consumer.
+	"""
+	def __init__(self,jobs):
+		self.refs,self.data = {},{}
+		self.lock = threading.RLock()
+		# files which another thread is loading
+		self.loading = {}
+		for job in jobs:
+			for up in job.upstream.values():
+				fn = up.result.files['dat']
+				self.refs[fn] = self.refs.get(fn,0)+1
+
+	def needed(self,fn): return self.refs.get(fn,0)>0
+
+	def has(self,fn):
+		with self.lock: return fn in self.data
+
+	def nbytes(self):
+		"""Memory held by the arrays in the cache."""
+		with self.lock:
+			return sum([getattr(v,'nbytes',0) for d in self.data.values() for v in d.values()])
+
+	@staticmethod
+	def freeze(data):
+		"""Make the arrays in a result read-only before they are shared."""
+		for val in data.values():
+			if hasattr(val,'flags'): val.flags.writeable = False
+		return data
+
+	def get(self,fn):
+		"""Return the data for an upstream dat file, loading it if it is not cached yet."""
+		data = self.fetch(fn)
+		# each consumer gets its own dictionary and attributes but the arrays are shared
+		return dict([(k,v if hasattr(v,'flags') else copy.deepcopy(v)) for k,v in data.items()])
+
+	def fetch(self,fn):
+		"""Load an upstream dat file into the cache and return the cached data without copying it."""
+		with self.lock:
+			if fn in self.data: return self.data[fn]
+			# wait for the prefetch thread instead of reading the same file twice
+			loading = self.loading.get(fn,None)
+			if not loading: self.loading[fn] = threading.Event()
+		if loading:
+			loading.wait()
+			return self.fetch(fn)
+		try:
+			data = load(os.path.basename(fn),cwd=os.path.dirname(fn))
+			with self.lock:
+				if self.needed(fn): self.data[fn] = self.freeze(data)
+		finally:
+			with self.lock: self.loading.pop(fn).set()
+		return data
+
+	def offer(self,fn,result,attrs):
+		"""
+		Keep a freshly computed result if pending jobs will need it.
+		The result mimics the output of load, which merges the attributes into the data.
+		"""
+		if not self.needed(fn): return
+		import numpy as np
+		data = dict([(k,np.array(v)) for k,v in result.items()])
+		# attributes pass through JSON on their way to disk so we do the same here
+		data.update(**json.loads(json.dumps(attrs if attrs else {})))
+		with self.lock: self.data[fn] = self.freeze(data)
+
+	def release(self,job):
+		"""Drop the references held by a job and evict entries that no pending job needs."""
+		with self.lock:
+			for up in job.upstream.values():
+				fn = up.result.files['dat']
+				self.refs[fn] = self.refs.get(fn,0)-1
+				if self.refs[fn]<=0: self.data.pop(fn,None)
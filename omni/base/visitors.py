@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+Frame visitors.
+Calculations written as visitors receive blocks of frames instead of reading the trajectory themselves,
+so omnicalc can feed a single pass over a slice to several calculations at once.
+"""
+
+from base.trajectory import FrameBlock
+
+class FrameVisitor:
+	"""
+	Base class for calculations which visit the frames of a slice.
+	Subclass it with the name of the calculation, set the selection, and write visit_frame (or visit for
+	whole blocks) and finish, which returns the usual result and attrs. The constructor receives the same
+	keyword arguments as a calculation function, and the atom group for the selection is available as
+	self.atoms once the pass starts.
+	"""
+	selection = 'all'
+
+	def __init__(self,**kwargs):
+		self.kwargs = kwargs
+		self.atoms = None
+		self.setup()
+
+	def setup(self):
+		"""Prepare the visitor before the pass."""
+		pass
+
+	def visit(self,block):
+		"""Visit a FrameBlock. The default sends each frame to visit_frame."""
+		for ii,frame in enumerate(block.frames):
+			self.visit_frame(frame,block.coords[ii],block.dimensions[ii])
+
+	def visit_frame(self,frame,coords,dimensions):
+		raise NotImplementedError('visitors must define visit_frame or visit')
+
+	def finish(self):
+		"""Return the result and attrs after the pass."""
+		raise NotImplementedError('visitors must define finish')
+
+def is_visitor(function):
+	"""Check if a calculation is a FrameVisitor class rather than a function."""
+	return isinstance(function,type) and issubclass(function,FrameVisitor)
+
+def run_visitors(reader,visitors,loud=True):
+	"""
+	Read the union of the atoms selected by several visitors once and send each block to every visitor.
+	Returns the result and attrs from each visitor in order.
+	"""
+	import numpy as np
+	groups = [reader.atoms(v.selection) for v in visitors]
+	indices = np.unique(np.concatenate([g.indices for g in groups]))
+	union = reader.universe.atoms[indices]
+	# positions of the atoms for each visitor within the union, in the order of the visitor selection
+	maps = [np.searchsorted(indices,g.indices) for g in groups]
+	whole = [np.array_equal(m,np.arange(len(indices))) for m in maps]
+	for visitor,group in zip(visitors,groups): visitor.atoms = group
+	for block in reader.blocks(selection=union,loud=loud):
+		for visitor,m,w in zip(visitors,maps,whole):
+			visitor.visit(block if w else FrameBlock(frames=block.frames,
+				coords=block.coords[:,m],dimensions=block.dimensions))
+	return [visitor.finish() for visitor in visitors]
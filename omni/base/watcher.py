@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+Watch the inputs to the compute loop.
+The watcher uses inotify when inotify_simple is installed and otherwise polls the modification times of the
+files it watches. Both report the changed paths since the last call to wait. Paths are resolved with
+realpath so that callers can compare them with the folders they watch.
+"""
+
+import os,re,glob,time,fnmatch
+
+class Watcher:
+	"""
+	Watch files which match a list of globs. Each glob is watched through its folder (without recursion),
+	so new files are noticed too. Temporary files from atomic writes are ignored.
+	"""
+	ignore = re.compile(r'\.tmp$|^\.|~$|\.swp$|\.pyc$')
+
+	def __init__(self,globs,interval=2.0,settle=0.5):
+		self.globs = [os.path.realpath(g) for g in globs]
+		self.folders = sorted(set([os.path.dirname(g) for g in self.globs]))
+		self.interval = interval
+		# editors often write a file in several steps so we wait for them to finish
+		self.settle = settle
+		try: import inotify_simple
+		except ImportError: inotify_simple = None
+		self.inotify = inotify_simple.INotify() if inotify_simple else None
+		if self.inotify:
+			flags = inotify_simple.flags
+			mask = (flags.CLOSE_WRITE|flags.MOVED_TO|flags.MOVED_FROM|flags.CREATE|flags.DELETE)
+			self.descriptors = dict([(self.inotify.add_watch(folder,mask),folder)
+				for folder in self.folders if os.path.isdir(folder)])
+		else: self.snapshot = self.scan()
+
+	@property
+	def method(self): return 'inotify' if self.inotify else 'polling'
+
+	def watched(self,fn):
+		return (not self.ignore.search(os.path.basename(fn)) and
+			any([fnmatch.fnmatch(fn,g) for g in self.globs]))
+
+	def scan(self):
+		"""Size and modification time of every watched file."""
+		found = {}
+		for fn in set([fn for g in self.globs for fn in glob.glob(g)]):
+			if not self.watched(fn): continue
+			try: stat = os.stat(fn)
+			except OSError: continue
+			found[os.path.realpath(fn)] = (stat.st_size,stat.st_mtime)
+		return found
+
+	def poll(self,timeout):
+		"""Return the paths which changed since the last poll."""
+		if self.inotify:
+			events = self.inotify.read(timeout=int(timeout*1000))
+			return set([os.path.realpath(fn) for fn in 
+				[os.path.join(self.descriptors.get(e.wd,''),e.name) for e in events] if self.watched(fn)])
+		time.sleep(timeout)
+		snapshot = self.scan()
+		changed = set([fn for fn in set(snapshot.keys())|set(self.snapshot.keys())
+			if snapshot.get(fn,None)!=self.snapshot.get(fn,None)])
+		self.snapshot = snapshot
+		return changed
+
+	def wait(self):
+		"""Block until something changes and return the changed paths."""
+		changed = set()
+		while not changed: changed = self.poll(self.interval)
+		# collect the rest of a burst of changes
+		while True:
+			more = self.poll(self.settle)
+			if not more: break
+			changed |= more
+		return sorted(changed)
+
+	def discard(self,paths):
+		"""
+		Forget pending changes to a list of paths, for example the files we wrote ourselves. Changes to other
+		files are kept and inotify returns them here since it cannot put them back.
+		"""
+		paths = set([os.path.realpath(fn) for fn in paths])
+		if self.inotify: return sorted([fn for fn in self.poll(0) if fn not in paths])
+		snapshot = self.scan()
+		for fn in paths:
+			if fn in snapshot: self.snapshot[fn] = snapshot[fn]
+			else: self.snapshot.pop(fn,None)
+		return []
+
+	def close(self):
+		if self.inotify: self.inotify.close()
@@ -7,11 +7,11 @@ Omnicalc command-line interface.
 #---expose interface functions from omnicalc.py as well
 __all__ = ['locate','set_config','nuke','setup','clone_calcs','blank_meta','audit','go',
 	#---interface functions from omnicalc
-	'compute','plot','look','clear_stale']
+	'compute','plot','look','clear_stale','clear_cache']
 
 import os,sys,re
 from config import read_config,write_config,is_terminal_command,bash,abspath,set_config
-from omnicalc import compute,plot,look,go,clear_stale
+from omnicalc import compute,plot,look,go,clear_stale,clear_cache
 
 default_config = {'commands': ['omni/cli.py'],'commands_aliases': [('set','set_config')]}
 
@@ -7,7 +7,7 @@ We consolidate all omnicalc conditionals here so they can access the global name
 Otherwise, parts of the workspace are passed to down to member instances.
 """
 
-import os,sys,re,glob,copy,json,time,tempfile
+import os,sys,re,glob,copy,json,time,tempfile,importlib,shutil
 
 from config import read_config,bash
 from datapack import json_type_fixer
@@ -17,6 +17,24 @@ from datapack import asciitree,delveset,dictsub,dictsub_sparse
 from structs import NameManager,Calculation,TrajectoryStructure,NoisyOmnicalcObject
 from base.autoplotters import inject_supervised_plot_tools
 from base.store import load,store
+from base.trajectory import TrajectoryReader,count_gro_atoms
+from base.history import JobHistory
+from base.scheduler import JobScheduler,memory_budget
+from base.instrument import JobMonitor,RunLog
+from base.upstream_cache import UpstreamCache
+from base.prefetch import Prefetcher
+from base.framewise import framewise,framewise_spec,count_frames,merge_framewise
+from base.framewise import partition_window,save_partition,load_partition
+from base.framewise import subset_window,subsample_framewise
+from base.journal import Journal,result_name
+from base.plan import PlanCache,job_key,digest
+from base.visitors import FrameVisitor,is_visitor,run_visitors
+from base.sweeps import sweep,is_sweep
+from base.universes import UniverseCache,SelectionCache
+from base.coordinates import CoordinateCache
+from base.governor import ResourceGovernor
+from base.checkpoint import Checkpoint
+from base.watcher import Watcher
 from makeface import tracebacker
 
 global namer
@@ -64,6 +82,8 @@ class Specifications:
 
 	def identify_specs_files(self):
 		"""Locate the specs files."""
+		# catalog again in case files were added since the last time we read the specs
+		self.avail = glob.glob(os.path.join(self.parent_cwd,*self.specs_path))
 		if not self.meta_cursor: 
 			# the meta_filter from the config is the default
 			if self.meta_filter: 
@@ -184,9 +204,52 @@ class ComputeJob:
 	def __init__(self,**kwargs):
 		self.calc = kwargs.pop('calc')
 		self.slice = kwargs.pop('slice')
+		# jobs interrupted after writing a checkpoint are resumed with their original result files
+		self.resume = False
 		#! calc has top-level information about slice and so does the slice. this should be checked!
 		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
 
+class FusedJob:
+	"""Several visitor jobs on the same slice which share a single pass over the trajectory."""
+	def __init__(self,**kwargs):
+		self.jobs = kwargs.pop('jobs')
+		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
+		self.slice = self.jobs[0].slice
+		self.slice_upstream = self.jobs[0].slice_upstream
+		self.resume = False
+		# the scheduler and the run cache see the union of the upstream jobs
+		self.upstream = dict([((job.calc.name,key),val) 
+			for job in self.jobs for key,val in job.upstream.items()])
+
+class BatchJob(FusedJob):
+	"""Jobs from one parameter sweep on the same slice which a calculation evaluates together."""
+	pass
+
+class PartitionJob:
+	"""One range of frames from a framewise job which can run alongside the other ranges."""
+	def __init__(self,**kwargs):
+		self.job = kwargs.pop('job')
+		self.part = kwargs.pop('part')
+		self.parts = kwargs.pop('parts')
+		self.fn = kwargs.pop('fn')
+		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
+		for key in ['calc','slice','slice_upstream','result','upstream']: 
+			self.__dict__[key] = self.job.__dict__[key]
+		self.resume = False
+		# the merge receives the resources used by each partition from the compute loop
+		self.report = None
+
+class MergeJob:
+	"""Merge the partitions of a framewise job into its result."""
+	def __init__(self,**kwargs):
+		self.partitions = kwargs.pop('partitions')
+		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
+		self.jobs = [self.partitions[0].job]
+		self.slice = self.jobs[0].slice
+		self.resume = False
+		# the scheduler runs the merge after every partition
+		self.upstream = dict([(('partition',p.part),p) for p in self.partitions])
+
 class Calculations:
 	"""
 	Supervise the calculations objects.
@@ -437,21 +500,8 @@ class PostData(NoisyOmnicalcObject):
 			spec=os.path.join(self.dn,self.fn))
 		for fn in self.files.values():
 			if os.path.isfile(fn): raise Exception('cannot preallocate filename %s because it exists'%fn)
-		# write an empty result and spec file before any computation to preempt file errors
-		try:
-			# the compute function will change the style from new to read after rewriting the dat file
-			store(obj={'error':'error'},name=os.path.basename(self.files['dat']),
-				path=self.dn,attrs={},verbose=False)
-		except Exception as e:
-			raise 
-			raise Exception('failed to prewrite file %s with PostData: %s'%(
-				self.files['dat'],self.__dict__))
-		try:
-			# write a dummy spec file
-			with open(self.files['spec'],'w') as fp: 
-				fp.write(json.dumps(self.specs))
-		except: raise Exception('failed to prewrite file %s with PostData: %s'%(
-			self.files['spec'],self.__dict__))
+		# the name is reserved in the journal and the files are only written when the result is complete
+		# ... at which point the compute function changes the style from new to read
 		# hold the basename for entry into the PostDataLibrary
 		self.basename = re.sub('\.spec$','',self.fn)
 
@@ -546,9 +596,23 @@ class PostDataLibrary:
 		# handle previous additions to the library which we want to save
 		self.previous = kwargs.pop('previous',None)
 		self.legacy_post_mode = kwargs.pop('legacy_post_mode',False)
+		# the journal holds the names reserved for results which are not complete yet
+		self.journal = kwargs.pop('journal',None)
+		# a dry run reads the journal without recovering anything
+		dry = kwargs.pop('dry',False)
 		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
+		if not self.journal: reserved,orphans = {},[]
+		elif dry: 
+			reserved,stored = self.journal.recoverable(self.where)
+			orphans = [name for name in stored if not os.path.isfile(os.path.join(self.where,name+'.spec'))]
+		else: reserved,orphans = self.journal.recover(self.where),[]
 		# generate a "stable" or "corral" of data objects
 		self.stable = [os.path.basename(i) for i in glob.glob(os.path.join(self.where,'*'))]
+		# dat files which only have their spec in the journal are left out until the next run recovers them
+		if orphans:
+			self.stable = [fn for fn in self.stable if fn not in [name+'.dat' for name in orphans]]
+			status('the next `make compute` recovers %d results stored before an interrupted run'%
+				len(orphans),tag='note')
 		# populate the toc with post slices not on disk from previous make_slices i.e. the readymade
 		if self.previous:
 			self.toc = dict([(k,v) for k,v in self.previous.toc.items() 
@@ -561,12 +625,14 @@ class PostDataLibrary:
 			status(name,tag='import',i=nfiles-len(self.stable)-1,looplen=nfiles,bar_width=10,width=65)
 			# interpret the name
 			namedat = self.namer.interpret_name(name)
+			# coordinate caches belong to their slice and are not post data
+			if CoordinateCache.owns(name): continue
 			# this puts the slice in limbo. we ignore stray files in post spot
-			if not namedat: self.toc[name] = {}
+			elif not namedat: self.toc[name] = {}
 			else:
 				# if this is a datspec file we find its pair and read the spec file
 				# +++ COMPARE namedat to two possible name_style values from the NameManager
-				if namedat['name_style'] in ['standard_datspec','standard_datspec_pbc_group']:
+				if namedat['name_style'] in ['standard_datspec','standard_datspec_pbc_group','digest_datspec']:
 					basename = self.get_twin(name,('dat','spec'))
 					this_datspec = PostData(fn=basename,dn=self.where,style='read')
 					#! note that there are many ways that PostData can fail but a common one is a failure
@@ -583,7 +649,7 @@ class PostDataLibrary:
 					#! handle invalid datspecs?
 					else: self.toc[basename] = {}
 				# register datspec files from readymade simulations here
-				elif namedat['name_style']=='readymade_datspec':
+				elif namedat['name_style'] in ['readymade_datspec','readymade_digest_datspec']:
 					basename = self.get_twin(name,('dat','spec'))
 					this_datspec = PostData(fn=basename,dn=self.where,style='read')
 					if this_datspec.valid: self.toc[basename] = this_datspec
@@ -609,6 +675,12 @@ class PostDataLibrary:
 						basename=basename,suffixes=['xtc','gro']))
 				#! alternate slice types (e.g. gro/trr) would go here
 				else: raise Exception('PostDataLibrary cannot parse post data %s'%namedat)
+		# results reserved by an interrupted or failed run are registered without files so they are resumed
+		for name,entry in reserved.items():
+			if name in self.toc: continue
+			specs = entry['specs']
+			if entry['state']=='failed': specs['meta']['failed'] = dict(error=entry.get('error'),when=entry['when'])
+			self.toc[name] = PostData(fn=name+'.spec',dn=self.where,style='new',specs=specs)
 
 	def limbo(self): return dict([(key,val) for key,val in self.toc.items() if val=={}])
 	def slices(self): return dict([(key,val) for key,val in self.toc.items() 
@@ -616,11 +688,15 @@ class PostDataLibrary:
 	def posts(self): return dict([(key,val) for key,val in self.toc.items() 
 		if val.__class__.__name__=='PostData'])
 
+	def previewed(self,val):
+		"""Check if a result is a preview computed on a subsample of its slice."""
+		return val.spec_version==3 and bool(val.specs.get('meta',{}).get('preview',False))
+
 	def search_results(self,job,debug=False):
-		"""Search the posts for a particular result."""
+		"""Search the posts for a particular result. Previews are never returned."""
 		candidates = [key for key,val in self.posts().items() 
 			# we find a match by matching the slice and calc, both of which have custom equivalence operators
-			if val.slice==job.slice and val.calc==job.calc]
+			if val.slice==job.slice and val.calc==job.calc and not self.previewed(val)]
 		if len(candidates)!=1:
 			# second attempt searches for a unique job with calc specs that are a superset of 
 			# ... the calc specs in the request. this maintains backwards compatibility with old data
@@ -630,7 +706,7 @@ class PostDataLibrary:
 			# ... eliminated several (at least five) additional comparisons
 			candidates_again = [key for key,val in self.posts().items() 
 				if val.slice==job.slice and val.calc.name==job.calc.name 
-				and dictsub(job.calc.specs,val.calc.specs)]
+				and dictsub(job.calc.specs,val.calc.specs) and not self.previewed(val)]
 			if len(candidates_again)==1: return self.toc[candidates_again[0]]
 			# this is the obvious place to debug if you think that omnicalc is trying to rerun completed jobs
 			else: 
@@ -645,7 +721,7 @@ class PostDataLibrary:
 					empty_dict_to_null(job_calc_specs) 
 					candidates_again_legacy = [key for key,val in self.posts().items() 
 						if val.slice==job.slice and val.calc.name==job.calc.name 
-						and dictsub(job_calc_specs,val.calc.specs)]
+						and dictsub(job_calc_specs,val.calc.specs) and not self.previewed(val)]
 				else: candidates_again_legacy = []
 				if len(candidates_again_legacy)==1: return self.toc[candidates_again_legacy[0]]
 				else:
@@ -655,6 +731,38 @@ class PostDataLibrary:
 					return False
 		else: return self.toc[candidates[0]]
 
+	def search_superset(self,job):
+		"""
+		Search the posts for a completed result of the same calculation on a slice which contains the 
+		requested slice. Returns the result with the fewest frames and the window of its frames which belong
+		to the requested slice, or None.
+		"""
+		if job.slice.style!='slice_request_named': return None
+		candidates = []
+		for key,val in self.posts().items():
+			if (val is job.result or val.style!='read' or not val.calc==job.calc 
+				or self.previewed(val)): continue
+			data = val.slice.data
+			if not all([data.get(k,None)==job.slice.data[k] for k in ['sn','group','pbc']]): continue
+			# failed and interrupted results are not complete
+			meta = val.specs.get('meta',{}) if val.spec_version==3 else {}
+			if meta.get('failed',False) or Checkpoint.exists(val.files['dat']): continue
+			window = subset_window(data,job.slice.data)
+			if window: candidates.append((val,window))
+		if not candidates: return None
+		return min(candidates,key=lambda c:(c[0].slice.data['end']-c[0].slice.data['start'])/
+			float(c[0].slice.data['skip']))
+
+	def search_preview(self,job,pending=False):
+		"""
+		Search the posts for a completed preview of the result for a job. Previews which are reserved in
+		the journal or failed are only returned if we ask for pending previews.
+		"""
+		candidates = [val for key,val in self.posts().items() if self.previewed(val)
+			and val.slice==job.slice and val.calc==job.calc and (pending or 
+				(val.style=='read' and not val.specs['meta'].get('failed',False)))]
+		return candidates[0] if candidates else None
+
 	def get_twin(self,name,pair):
 		"""
 		Many slices files have natural twins e.g. dat/spec and gro/xtc.
@@ -810,6 +918,17 @@ class WorkSpace:
 		self.meta_cursor = kwargs.pop('meta_cursor',
 			self.plot_kwargs.pop('meta_cursor',self.plot_kwargs.pop('meta',None)))
 		self.is_live = kwargs.pop('is_live',False)
+		# number of jobs to run at once in the compute loop (otherwise set by compute_jobs in the config)
+		compute_jobs = kwargs.pop('jobs',None)
+		# the dry run prints a plan for the compute loop and optionally writes it to a JSON file
+		self.plan_fn = kwargs.pop('plan',None)
+		self.dry = kwargs.pop('dry',False) or bool(self.plan_fn)
+		# continue with independent jobs after a failure
+		keep_going = kwargs.pop('keep_going',False)
+		# number of ranges of frames for framewise jobs (otherwise set by compute_partitions in the config)
+		partitions = kwargs.pop('partitions',None)
+		# previews compute pending jobs on every few frames before the full jobs run in the background
+		preview = kwargs.pop('preview',False)
 		debug_flags = [False,'slices','compute','stale','missing']
 		self.debug = kwargs.pop('debug',False)
 		if self.debug not in debug_flags: raise Exception('debug argument must be in %s'%debug_flags)
@@ -821,12 +940,23 @@ class WorkSpace:
 		self.read_config()
 		# settings which depend on the config
 		self.mpl_agg = self.config.get('mpl_agg',False)
+		self.compute_jobs = int(compute_jobs if compute_jobs else self.config.get('compute_jobs',1))
+		self.keep_going = keep_going or self.config.get('keep_going',False)
+		partitions = partitions if partitions else self.config.get('compute_partitions',None)
+		self.partitions = int(partitions) if partitions else None
+		self.preview = (int(self.config.get('preview_stride',10)) if preview is True 
+			else int(preview) if preview else None)
 		# the specifications folder is read only once per workspace, but specs can be refreshed
 		self.specs_folder = Specifications(specs_path=self.specs_path,
 			meta_cursor=self.meta_cursor,parent_cwd=self.cwd,
 			meta_filter=self.config.get('meta_filter',None))
 		# placeholders for children
 		for child in self._children: self.__dict__[child] = None
+		# the script index and calculation modules are cached for the life of the workspace
+		self.script_index,self.calc_modules = {},{}
+		# universes are shared by the jobs in a run and selection indices are saved in the post spot
+		self.universes = UniverseCache(size=self.config.get('universe_cache',4))
+		self.selections = SelectionCache(os.path.join(self.postdir,'.omnicalc','selections'))
 		# the main compute loop for the workspace determines the execution function
 		getattr(self,self.state.execution_name)()
 
@@ -873,14 +1003,24 @@ class WorkSpace:
 		self.postdir = self.paths['post_data_spot']
 		self.plotdir = self.paths['post_plot_spot']
 
+	def build_script_index(self,root='calcs'):
+		"""
+		Index the files in the calculations folder by name. This walk happens once per workspace.
+		"""
+		index = {}
+		for (dirpath, dirnames, filenames) in os.walk(os.path.join(self.cwd,root)): 
+			for fn in filenames: index.setdefault(fn,[]).append(dirpath+'/'+fn)
+		return index
+
 	def find_script(self,name,root='calcs'):
 		"""Find a generic script somewhere in the calculations folder."""
-		#! legacy code needs reviewed
-		# find the script with the funtion
-		fns = []
-		for (dirpath, dirnames, filenames) in os.walk(os.path.join(self.cwd,root)): 
-			fns.extend([dirpath+'/'+fn for fn in filenames])
-		search = [fn for fn in fns if re.match('^%s(?:\.py)?$'%name,os.path.basename(fn))]
+		names = [name]+([name+'.py'] if not name.endswith('.py') else [])
+		if root not in self.script_index: self.script_index[root] = self.build_script_index(root=root)
+		search = [fn for n in names for fn in self.script_index[root].get(n,[])]
+		# rebuild the index once in case the script was added after we indexed the folder
+		if len(search)==0:
+			self.script_index[root] = self.build_script_index(root=root)
+			search = [fn for n in names for fn in self.script_index[root].get(n,[])]
 		if len(search)==0: 
 			raise Exception('cannot find a script for %s'%name)
 		elif len(search)>1: raise Exception('redundant matches: %s'%str(search))
@@ -970,10 +1110,9 @@ class WorkSpace:
 			# update the plotspec if the plotname changes. this also updates the upstream pointers
 			self.plotspec = PlotSpec(metadata=self.metadata,plotname=self.plotname,
 				calcs=self.calcs,workspace=self)
-		# we always run the compute loop to make sure calculations are complete but also to get the jobs
-		# note that compute runs may be redundant if we call plotload more than once but it avoids repeats
-		#! skip can be dangerous
-		self.compute(automatic=False)
+		# we always survey the jobs to make sure the calculations we load are complete
+		# note that only the jobs for this plot must be complete so unrelated pending jobs are ignored
+		self.survey()
 		if not collections_alt: sns = self.plotspec.sns()
 		else: sns = collections_alt
 		if not sns: raise Exception('cannot get simulations for plot %s'%self.plotname)
@@ -1031,7 +1170,15 @@ class WorkSpace:
 					i=snum+len(sns)*cnum,looplen=len(sns)*len(upstream_requests),tag='load')
 				if calcname not in bundle['data']: bundle['data'][calcname] = {}
 				job = self.connect_upstream_calculation(request=request,sn=sn)
-				fn = job.result.files['dat']
+				result = job.__dict__.get('result',None)
+				# a preview stands in for a pending result until the full result replaces it
+				if any([job is j for j in self.queue_computes]):
+					result = self.post.search_preview(job)
+					if not result: raise Exception(('calculation %s for simulation %s is pending. try '
+						'`make compute` or work.get before plotting')%(calcname,sn))
+					status('calculation %s for simulation %s is pending so we are loading a preview with '
+						'every %d frames'%(calcname,sn,result.specs['meta']['preview']['stride']),tag='warning')
+				fn = result.files['dat']
 				data = load(os.path.basename(fn),cwd=os.path.dirname(fn))
 				if data.get('error',False) in ['error',b'error']:
 					raise Exception('calculation failed. clear the dat/spec files corresponding '
@@ -1051,6 +1198,10 @@ class WorkSpace:
 					# send along times for frame information
 					bundle['calc']['extras'][sn].update(**dict([(k,slice_upstream.data['body'][k]) 
 						for k in ['start','end','skip']]))
+					if result is not job.__dict__.get('result',None):
+						stride = result.specs['meta']['preview']['stride']
+						bundle['calc']['extras'][sn].update(preview=stride,
+							skip=bundle['calc']['extras'][sn]['skip']*stride)
 				except: pass
 			bundle['calc'][calcname] = {'calcs':{'specs':job.calc.specs}}
 		# data are returned according to a versioning system
@@ -1282,18 +1433,11 @@ class WorkSpace:
 			# we already added this slice to post
 			else: pass
 
-	def make_slices_automacs(self,jobs):
+	def slice_specs_automacs(self,jobs):
 		"""
-		Make GROMACS trajectory slices from source data.
+		Prepare the basic slice specifications for make_slices_automacs without redundancy.
 		"""
-		if not jobs: return
-		# only parse simulation data if we need to make slices
-		from base.parser import ParsedRawData
-		self.parse_sources()
-		from base.slicer import make_slice_gromacs,edrcheck
-		# cache important parts of the slice
-		slices_new,slices_new_base = [],[]
-		# prepare simple slices (this prevents redundancy)
+		slices_new_base = []
 		for jnum,job in enumerate(jobs):
 			# prepare slice information for the slicer
 			#! note that the make_slice_gromacs function is legacy and hence requires careful inputs
@@ -1304,6 +1448,19 @@ class WorkSpace:
 			slice_spec['sn'] = sn
 			slice_spec['group_name'] = job.slice.data['group']
 			if slice_spec not in slices_new_base: slices_new_base.append(slice_spec)
+		return slices_new_base
+
+	def make_slices_automacs(self,jobs):
+		"""
+		Make GROMACS trajectory slices from source data.
+		"""
+		if not jobs: return
+		# only parse simulation data if we need to make slices
+		from base.parser import ParsedRawData
+		self.parse_sources()
+		from base.slicer import make_slice_gromacs,edrcheck
+		# cache important parts of the slice
+		slices_new,slices_new_base = [],self.slice_specs_automacs(jobs)
 		# loop over basic slices and populate with other requirements
 		for slice_spec in slices_new_base:
 			sn = slice_spec['spec']['sn']
@@ -1342,82 +1499,86 @@ class WorkSpace:
 		for snum,slice_spec in enumerate(slices_new):
 			asciitree(dict(slice=slice_spec))
 			status('making slice %d/%d'%(snum+1,len(slices_new)),tag='slice')
-			make_slice_gromacs(postdir=self.postdir,**slice_spec)
+			make_slice_gromacs(postdir=self.postdir,universes=self.universes,selections=self.selections,
+				**slice_spec)
 
-	def prepare_compute(self,jobs):
+	def connect_slices(self,jobs):
 		"""
-		Prepare and simulate the calculations to prevent name collisions.
+		Attach existing trajectory slices to jobs and return the jobs which still require slices.
 		"""
-		#!? check for missing twins?
-		# assemble a list of result file names in order to generate new ones
-		post_fns = [os.path.basename(v.files['spec']) for k,v in self.post.posts().items()]
-		# track spec files for each basename
-		spec_toc = {}
-		for fn in post_fns:
-			basename = re.match('^(.+)\.n\d+\.spec$',fn).group(1)
-			if basename not in spec_toc: spec_toc[basename] = []
-			spec_toc[basename].append(fn)
-		for k,v in spec_toc.items(): spec_toc[k] = sorted(v)
-		# acquire slices
 		jobs_require_slices = []
 		for job in jobs:
 			# find the trajectory slice
 			keys = [key for key,val in self.post.slices().items() if val==job.slice]
 			if len(keys)!=1: jobs_require_slices.append(job)
 			else: job.slice_upstream = self.post.toc[keys[0]]
+		return jobs_require_slices
+
+	def connect_upstream(self,jobs):
+		"""
+		Connect jobs to the upstream jobs which supply their data.
+		"""
+		for job in jobs:
+			# convert the upstream calculation requests into proper calculations
+			upstream_requests = self.collect_upstream_calculations(job.calc.specs.get('upstream',{}))
+			# connect requests to jobs
+			upstream = dict([(name,self.connect_upstream_calculation(
+				request=request,sn=job.slice.data['sn'])) for name,request in upstream_requests.items()])
+			# tack the upstream jobs on for later
+			job.upstream = upstream
+
+	def prepare_compute(self,jobs):
+		"""
+		Prepare and simulate the calculations to prevent name collisions.
+		"""
+		#!? check for missing twins?
+		# content-addressed names come directly from the job but sequential names need a table of the
+		# ... existing names which we only build when a job needs one
+		spec_toc = None
+		# results which are derived from a completed superset do not need their own slice
+		for job in jobs: job.superset = self.find_superset_result(job)
+		# acquire slices
+		jobs_require_slices = self.connect_slices([job for job in jobs if not job.superset])
 		# if we need to make slices we will return
 		if jobs_require_slices: 
 			self.make_slices(jobs_require_slices)
 			# after loading slices we have to re-parse the postdata
 			#! this will overwrite things!
 			self.post = PostDataLibrary(where=self.postdir,director=self.metadata.director,
-				previous=self.post,legacy_post_mode=self.config.get('legacy_post_mode',False))
+				previous=self.post,legacy_post_mode=self.config.get('legacy_post_mode',False),
+				journal=self.journal)
 			# match the upstream slices here
-			for job in jobs:
+			for job in [job for job in jobs if not job.superset]:
 				# find the trajectory slice
 				keys = [key for key,val in self.post.slices().items() if val==job.slice]
 				if len(keys)!=1: raise Exception('failed to make and identify slices. development error')
 				else: job.slice_upstream = self.post.toc[keys[0]]
 		# acquire upstream data without loading it yet
-		for job in jobs:
-			# convert the upstream calculation requests into proper calculations
-			upstream_requests = self.collect_upstream_calculations(job.calc.specs.get('upstream',{}))
-			# connect requests to jobs
-			upstream = dict([(name,self.connect_upstream_calculation(
-				request=request,sn=job.slice.data['sn'])) for name,request in upstream_requests.items()])
-			# tack the upstream jobs on for later
-			job.upstream = upstream
+		self.connect_upstream(jobs)
 		# loop over jobs and register filenames
-		self.pending = []
+		self.pending,reserved = [],[]
 		for job in jobs:
-			#! style will be updated from standard/datspec later on
-			#! intervene here to name i.e. "undulations" with the group and pbc since that is unnecessary
-			# by default we do not pass PBC or group name to the datspec anymore; this was standard in 
-			# ... version 1,2 spec files. set name_style: standard_datspec_pbc_group in the calculation
-			# ... if you want to force the full name. otherwise all post-data omits this. all downstream
-			# ... calculations also omit the PBC and group by default anyway.
-			name_style = job.calc.name_style
-			# if readymade we set the name_style here
-			if not name_style and job.slice.style=='readymade': name_style_this = 'readymade_datspec'
-			elif not name_style: name_style_this = 'standard_datspec'
-			else: name_style_this = name_style
-			basename = self.namer.basename(job=job,name_style=name_style_this)
-			# prepare suffixes for new dat files
-			keys = [int(re.match('^%s\.n(\d+)\.spec$'%basename,key).group(1)) 
-				for key in spec_toc.get(basename,[]) if re.match('^%s'%basename,key)]
-			if keys and not sorted([int(i) for i in keys])==list(range(len(keys))):
-				raise Exception('non sequential keys found for data objects prefixed with %s'%basename)
-			# make the new filename
-			fn = '%s.n%d.spec'%(basename,len(keys))
-			if basename not in spec_toc: spec_toc[basename] = []
-			# save the filename so new files give unique spec file names
-			spec_toc[basename].append(fn)
+			# resumed jobs keep the names reserved by the interrupted run
+			if job.resume:
+				if self.failed_result(job.result): action = 'retrying failed'
+				elif Checkpoint.exists(job.result.files['dat']): action = 'resuming'
+				else: action = 'recovering reserved'
+				status('%s calculation for %s'%(action,job.result.files['dat']),tag='status')
+				self.pending.append(job)
+				continue
+			name_style = self.result_name_style(job)
+			basename = self.namer.basename(job=job,name_style=name_style)
+			if self.namer.parser[name_style].get('digest',False): fn = '%s.spec'%basename
+			else:
+				if spec_toc==None: spec_toc = self.sequential_names()
+				fn = self.sequential_name(spec_toc,basename)
 			#! +++ BUILD slice object this slice went nowhere: new_slice = Slice(data=job.slice.data)
 			# designing the new version three (v3) spec format here
 			sn = job.slice.data['sn']
 			spec_new = dict(
 				meta={'spec_version':3,'sn':job.slice.data['sn']},
 				slice=job.slice.data,calc={'name':job.calc.name,'specs':job.calc.specs})
+			if getattr(job,'preview',None): spec_new['meta']['preview'] = dict(stride=job.preview)
 			# create the new result file
 			status('preparing data file for new calculation %s'%fn,tag='status')
 			job.result = PostData(fn=fn,dn=self.postdir,style='new',specs=spec_new)
@@ -1426,8 +1587,64 @@ class WorkSpace:
 			# register the result with the postdat library so we can simulate the compute loop
 			else: self.post.toc[job.result.basename] = job.result
 			self.pending.append(job)
+			reserved.append(job.result)
+		# reserve every new name with a single write to the journal
+		self.journal.reserve(reserved)
 		# after make new postdata objects we want to check for new computations
-		self.check_compute(debug=True)
+		self.check_compute(debug=True,jobs=jobs)
+
+	def result_name_style(self,job):
+		"""
+		Choose the name style for a new result from the calculation or the director.
+		"""
+		#! style will be updated from standard/datspec later on
+		#! intervene here to name i.e. "undulations" with the group and pbc since that is unnecessary
+		# by default we do not pass PBC or group name to the datspec anymore; this was standard in 
+		# ... version 1,2 spec files. set name_style: standard_datspec_pbc_group in the calculation
+		# ... if you want to force the full name. otherwise all post-data omits this. all downstream
+		# ... calculations also omit the PBC and group by default anyway.
+		name_style = job.calc.name_style or self.metadata.director.get('name_style',None)
+		# if readymade we set the name_style here
+		if job.slice.style=='readymade':
+			if name_style=='digest_datspec': return 'readymade_digest_datspec'
+			elif not name_style: return 'readymade_datspec'
+		elif not name_style: return 'standard_datspec'
+		return name_style
+
+	def sequential_names(self):
+		"""
+		Collect the spec files for each basename in order to number new results.
+		"""
+		# assemble a list of result file names in order to generate new ones
+		post_fns = [os.path.basename(v.files['spec']) for k,v in self.post.posts().items()]
+		# names which were rolled back are never reused so the numbering stays sequential
+		post_fns = sorted(set(post_fns+['%s.spec'%name for name,entry in self.journal.replay().items()
+			if entry['state']=='rolled_back']))
+		# track spec files for each basename
+		spec_toc = {}
+		for fn in post_fns:
+			match = re.match('^(.+)\.n\d+\.spec$',fn)
+			# content-addressed names are not numbered
+			if not match: continue
+			spec_toc.setdefault(match.group(1),[]).append(fn)
+		for k,v in spec_toc.items(): spec_toc[k] = sorted(v)
+		return spec_toc
+
+	def sequential_name(self,spec_toc,basename):
+		"""
+		Choose the next numbered spec file name for a basename and add it to the table.
+		"""
+		# prepare suffixes for new dat files
+		keys = [int(re.match('^%s\.n(\d+)\.spec$'%basename,key).group(1)) 
+			for key in spec_toc.get(basename,[]) if re.match('^%s'%basename,key)]
+		if keys and not sorted([int(i) for i in keys])==list(range(len(keys))):
+			raise Exception('non sequential keys found for data objects prefixed with %s'%basename)
+		# make the new filename
+		fn = '%s.n%d.spec'%(basename,len(keys))
+		if basename not in spec_toc: spec_toc[basename] = []
+		# save the filename so new files give unique spec file names
+		spec_toc[basename].append(fn)
+		return fn
 
 	def prelim(self):
 		"""Preliminary materials for compute and plot."""
@@ -1438,14 +1655,14 @@ class WorkSpace:
 		# prepare a calculations object
 		self.calcs = Calculations(specs=self.metadata)
 
-	def check_compute(self,debug=False):
+	def check_compute(self,debug=False,jobs=None):
 		"""
 		See if we need to run any calculations.
 		"""
 		# save completed jobs as results
 		self.results,self.queue_computes = [],[]
 		# join jobs with results
-		for job in self.jobs:
+		for job in (self.jobs if jobs==None else jobs):
 			# jobs have slices in alternate/calculation_request form and they must be fleshed out
 			# +++ COMPARE job slice to slices in the metadata
 			slice_match = self.slices.search(job.slice)
@@ -1454,7 +1671,7 @@ class WorkSpace:
 			# replace the job slice with the metadata slice if we found a match
 			else: job.slice = slice_match
 			# search for a result
-			job.result = self.post.search_results(job=job)
+			job.result = self.find_result(job)
 			if not job.result: 
 				if self.debug=='missing':
 					#! this debug section lets you investigate why a result is on disk and missing
@@ -1465,8 +1682,46 @@ class WorkSpace:
 				# the debug mode throws an exception to indicate that the preemptive compute failed
 				if debug: raise Exception('failed to simulate compute loop for job %s'%job)
 				self.queue_computes.append(job)
+			# a result which is only reserved in the journal belongs to an interrupted or failed job which
+			# ... we resume with the same name. legacy placeholder files with a checkpoint or a failed mark
+			# ... are also resumed. however the simulated compute loop in debug mode counts these as reserved
+			elif not debug and (job.result.style=='new' or Checkpoint.exists(job.result.files['dat']) 
+				or self.failed_result(job.result)):
+				job.resume = True
+				self.queue_computes.append(job)
 			else: self.results.append(job)
 
+	def find_result(self,job):
+		"""
+		Find the result for a job. Results for calculations which are unchanged since the last run and 
+		content-addressed results are looked up by name before we search.
+		"""
+		if getattr(job,'preview',None): return self.post.search_preview(job,pending=True)
+		name = self.plan_cache.result(job,self.plan_digests.get(job.calc.name,None))
+		result = self.post.toc.get(name,None) if name else None
+		if (result and result.__class__.__name__=='PostData' 
+			and result.slice==job.slice and result.calc==job.calc): return result
+		name_style = self.result_name_style(job)
+		if self.namer.parser.get(name_style,{}).get('digest',False):
+			result = self.post.toc.get(self.namer.basename(job=job,name_style=name_style),None)
+			if (result and result.__class__.__name__=='PostData' 
+				and result.slice==job.slice and result.calc==job.calc): return result
+		return self.post.search_results(job=job)
+
+	def failed_result(self,result):
+		"""Check if a result is the placeholder for a failed job."""
+		return result.spec_version==3 and bool(result.specs.get('meta',{}).get('failed',False))
+
+	def mark_failed(self,job,error):
+		"""
+		Mark a failed job in the journal so the next run retries it with the same name.
+		"""
+		failed = dict(error=error.strip().splitlines()[-1],when=time.time())
+		self.journal.record(result_name(job.result.files['dat']),'failed',error=failed['error'])
+		# legacy placeholders have a spec file which we mark as well
+		if os.path.isfile(job.result.files['spec']): self.rewrite_spec(job,failed=failed)
+		else: job.result.specs['meta']['failed'] = failed
+
 	def attach_standard_tools(self,mod):
 		"""
 		Send standard tools to the calculation functions.
@@ -1483,6 +1738,21 @@ class WorkSpace:
 		mod.uniquify = uniquify
 		mod.status = status
 		mod.framelooper = framelooper
+		#---streaming trajectory reader
+		mod.TrajectoryReader = TrajectoryReader
+		#---shared universes and cached selections
+		mod.universes = self.universes
+		mod.selections = self.selections
+		mod.framewise = framewise
+		mod.FrameVisitor = FrameVisitor
+		mod.sweep = sweep
+		#---split-apply-combine over frames with streaming reducers
+		from base.compute_loop import reduce_frames,Reducer,Sum,MeanVariance,Histogram
+		mod.reduce_frames = reduce_frames
+		mod.Reducer = Reducer
+		mod.Sum = Sum
+		mod.MeanVariance = MeanVariance
+		mod.Histogram = Histogram
 		#---parallel processing
 		from joblib import Parallel,delayed
 		#! sharable memory is outdated: from joblib.pool import has_shareable_memory
@@ -1497,75 +1767,659 @@ class WorkSpace:
 		calculations must be in a function in a script which each use the calculation name.
 		"""
 		script_name = self.find_script(calcname)
-		#---! needs python3
-		sys.path.insert(0,os.path.dirname(script_name))
-		mod = __import__(re.sub('\.py$','',os.path.basename(script_name)),locals(),globals())
-		#---attach standard tools
-		self.attach_standard_tools(mod)
+		mtime = os.path.getmtime(script_name)
+		# modules are cached by script path and only reloaded when the script changes
+		cached = self.calc_modules.get(script_name,None)
+		if cached and cached[0]==mtime: mod = cached[1]
+		else:
+			if os.path.dirname(script_name) not in sys.path: 
+				sys.path.insert(0,os.path.dirname(script_name))
+			#---! needs python3
+			if cached: mod = importlib.reload(cached[1])
+			else: mod = __import__(re.sub('\.py$','',os.path.basename(script_name)),locals(),globals())
+			#---attach standard tools once per module
+			self.attach_standard_tools(mod)
+			self.calc_modules[script_name] = (mtime,mod)
 		if not hasattr(mod,calcname): raise Exception(('performing calculation "%s" and we found '+
 			'%s but it does not contain a function named %s')%(calcname,script_name,calcname))
 		return getattr(mod,calcname)
 
-	def run_compute(self):
+	def slice_files(self,job):
 		"""
-		Run jobs and save to preemptive dat files.
+		Get the structure and trajectory files for the slice attached to a job.
+		"""
+		# unpack files depending on the type of slice
+		#! note that this is where you would run a custom importer for non-MD data
+		if job.slice.style=='readymade':
+			struct_file = os.path.join(self.postdir,job.slice_upstream.data['structure'])
+			traj_file = [os.path.join(self.postdir,i) for i in str_or_list(
+				job.slice_upstream.data['trajectory'])]
+		elif job.slice.style=='slice_request_named':
+			#! post directory is hard-coded here
+			struct_file = os.path.join(self.postdir,'%s.%s'%(job.slice_upstream.data['basename'],'gro'))
+			traj_file = os.path.join(self.postdir,'%s.%s'%(job.slice_upstream.data['basename'],'xtc'))
+		else: raise Exception('dev')
+		return struct_file,traj_file
+
+	def job_dimensions(self,job):
 		"""
-		for jnum,job in enumerate(self.pending):
+		Estimate the number of frames and atoms for a job without reading the trajectory.
+		"""
+		frames = None
+		if job.slice.style=='slice_request_named':
+			frames = int((job.slice.data['end']-job.slice.data['start'])/job.slice.data['skip'])+1
+		# slices which have not been made yet have no structure to count
+		if not hasattr(job,'slice_upstream'): return frames,None
+		struct_file,traj_file = self.slice_files(job)
+		return frames,count_gro_atoms(struct_file)
+
+	def job_memory(self,job,history):
+		"""
+		Estimate the peak memory for a job from the upstream data, the slice, and the history.
+		Returns None when none of these are known.
+		"""
+		pending = set([id(j) for j in self.pending])
+		inputs = []
+		for up in job.upstream.values():
+			if id(up) in pending: inputs.append(history.typical(up.calc.name,'write_bytes'))
+			elif os.path.isfile(up.result.files['dat']): inputs.append(os.path.getsize(up.result.files['dat']))
+		if job.calc.raw['uptype']=='simulation' and hasattr(job,'slice_upstream'):
+			struct_file,traj_file = self.slice_files(job)
+			inputs.extend([os.path.getsize(fn) for fn in [struct_file]+str_or_list(traj_file) 
+				if os.path.isfile(fn)])
+		inputs = [i for i in inputs if i!=None]
+		peak = history.peak_memory(job.calc.name)
+		if peak==None and not inputs: return None
+		# the inputs are a floor for jobs without history or for jobs on larger inputs than before
+		return max(peak or 0,sum(inputs))
+
+	def find_prefix_result(self,job):
+		"""
+		Find the longest completed result for the same calculation on a shorter slice with the same start 
+		and skip. Framewise-separable calculations extend this result instead of starting over.
+		"""
+		if job.slice.style!='slice_request_named' or getattr(job,'preview',None): return None
+		candidates = []
+		for key,val in self.post.posts().items():
+			if val is job.result or not val.calc==job.calc or self.post.previewed(val): continue
+			data = val.slice.data
+			if not all([data.get(k,None)==job.slice.data[k] for k in ['sn','group','pbc','start','skip']]):
+				continue
+			if data.get('end',None)==None or not data['end']<job.slice.data['end']: continue
+			# placeholders for pending or interrupted jobs are not results yet
+			if val.style!='read' or Checkpoint.exists(val.files['dat']): continue
+			candidates.append(val)
+		return max(candidates,key=lambda v:v.slice.data['end']) if candidates else None
+
+	def find_superset_result(self,job):
+		"""
+		Find a completed result for a framewise-separable calculation on a slice which contains the slice for
+		this job. The result for the job is derived by subsampling its frames instead of computing it.
+		"""
+		if not self.config.get('framewise_subsets',True) or getattr(job,'preview',None): return None
+		if not framewise_spec(self.get_calculation_function(job.calc.name)): return None
+		return self.post.search_superset(job)
+
+	def state_path(self,name,create=True):
+		"""
+		Path to a bookkeeping file in a hidden folder in the post spot.
+		"""
+		dn = os.path.join(self.postdir,'.omnicalc')
+		if create and not os.path.isdir(dn): os.mkdir(dn)
+		return os.path.join(dn,name)
+
+	def load_upstream(self,job):
+		"""
+		Load upstream data files at the last moment unless they are already held in the run cache.
+		"""
+		upstream = {}
+		cache = self.__dict__.get('upstream_cache',None)
+		for unum,(key,val) in enumerate(job.upstream.items()):
+			status('caching upstream data from calculation %s'%key,
+				i=unum,looplen=len(job.upstream),tag='load')
+			fn = val.result.files['dat']
+			if cache: data = cache.get(fn)
+			else: data = load(os.path.basename(fn),cwd=os.path.dirname(fn))
+			upstream[key] = data
+		return upstream
+
+	def job_arguments(self,job,upstream,window=None):
+		"""
+		Prepare the keyword arguments for a calculation.
+		"""
+		# +++ BUILD arguments structure as the compute function would expect
+		#! it would be nice to formalize this or make it less gromacs-specific? perhaps by using a mode?
+		outgoing = dict(workspace=self,sn=job.slice_upstream.data['sn'],calc=dict(specs=job.calc.specs))
+		struct_file,traj_file = self.slice_files(job)
+		outgoing.update(upstream=upstream)
+		# we run plot_prepare because some calculation scripts require it
+		self.plot_prepare()
+		# redundant keywords are structure/grofile and trajectory/trajfile
+		outgoing = dict(grofile=struct_file,trajfile=traj_file,
+			structure=struct_file,trajectory=traj_file,**outgoing)
+		# the reader streams blocks of frames and only opens the trajectory if the calculation uses it
+		outgoing['reader'] = TrajectoryReader(structure=struct_file,trajectory=traj_file,
+			memory=self.config.get('reader_memory',TrajectoryReader.memory),window=window,
+			universes=self.universes,selections=self.selections,
+			coordinate_cache=self.config.get('coordinate_cache',False))
+		# calculations can save partial per-frame results and resume from them after a failure
+		outgoing['checkpoint'] = Checkpoint(job.result.files['dat'],
+			interval=self.config.get('checkpoint_interval'))
+		return outgoing
+
+	def save_result(self,job,result,attrs,checkpoint=None):
+		"""
+		Replace the placeholder dat file with the result.
+		"""
+		if job.result.style!='computing': raise Exception('attmpting to compute a stale job')
+		# we remove legacy placeholder dat files before continuing. one of very few delete commands
+		if os.path.isfile(job.result.files['dat']): os.remove(job.result.files['dat'])
+		# the dat file is written elsewhere in the post spot and moved into place once it is complete
+		staging = self.state_path('staging')
+		if not os.path.isdir(staging): os.mkdir(staging)
+		name = os.path.basename(job.result.files['dat'])
+		if os.path.isfile(os.path.join(staging,name)): os.remove(os.path.join(staging,name))
+		store(obj=result,name=name,path=staging,attrs=attrs,verbose=False)
+		os.rename(os.path.join(staging,name),job.result.files['dat'])
+		status('[WRITING] %s'%job.result.files['dat'])
+		# partial results are obsolete once the final result is stored
+		if checkpoint: checkpoint.discard()
+		# downstream jobs in this run can use the result without reading it back from disk. parallel jobs
+		# ... run in forked workers so the compute loop loads their results into the cache instead
+		cache = self.__dict__.get('upstream_cache',None)
+		if cache and self.compute_jobs==1: cache.offer(job.result.files['dat'],result,attrs)
+
+	def finish_job(self,job,frames,atoms,resources,**meta):
+		"""
+		Record the resources for a completed job and return its report.
+		"""
+		# resources are saved in the v3 spec meta next to the result
+		job.result.specs['meta'].pop('failed',None)
+		self.rewrite_spec(job,resources=resources,**meta)
+		# register the result as equivalent to one that had been read from disk
+		job.result.style = 'read'
+		return dict(calc=job.calc.name,sn=job.slice.data['sn'],dat=job.result.files['dat'],
+			frames=frames,atoms=atoms,resources=resources)
+
+	def run_job(self,job,jnum=0):
+		"""
+		Run a single job and save the result to its preemptive dat file.
+		Returns a report for the job history and the run log.
+		"""
+		if isinstance(job,BatchJob): return self.run_batch(job,jnum=jnum)
+		elif isinstance(job,FusedJob): return self.run_fused(job,jnum=jnum)
+		elif isinstance(job,PartitionJob): return self.run_partition(job,jnum=jnum)
+		elif isinstance(job,MergeJob): return self.run_merge(job,jnum=jnum)
+		elif getattr(job,'superset',None): return self.run_derive(job,jnum=jnum)
+		monitor = JobMonitor(trace=self.config.get('tracemalloc',True)).start()
+		job.result.style = 'computing'
+		#! carefully print the result otherwise it double prints slice, calc
+		asciitree(dict(calculation={
+			'result':dict([(k,job.result.__dict__[k]) for k in ['files','spec_version','specs']]),
+			'slice_request':job.slice.__dict__,'calc':job.calc.__dict__,
+			'slice':job.slice_upstream.__dict__,}))
+		status('running calculation %d/%d'%(jnum+1,len(self.pending)),tag='compute')
+		function = self.get_calculation_function(job.calc.name)
+		with monitor.phase('upstream'):
+			upstream = self.load_upstream(job)
+			# framewise calculations on a lengthened slice only compute the frames after an earlier result
+			framewise_this = framewise_spec(function)
+			prefix = (self.find_prefix_result(job) 
+				if framewise_this and self.config.get('framewise_extend',True) else None)
+			if prefix:
+				prefix_data = load(os.path.basename(prefix.files['dat']),cwd=os.path.dirname(prefix.files['dat']))
+				prefix_frames = count_frames(prefix_data,framewise_this['constant'])
+				status('extending %s from frame %d'%(prefix.files['dat'],prefix_frames),tag='compute')
+		if prefix: window = (prefix_frames,None,None)
+		# previews read every few frames of the slice
+		elif getattr(job,'preview',None): window = (None,None,job.preview)
+		else: window = None
+		outgoing = self.job_arguments(job,upstream,window=window)
+		reader = outgoing['reader']
+		with monitor.phase('function'): 
+			# visitors are fed frames by omnicalc instead of reading the trajectory themselves
+			if is_visitor(function): result,attrs = run_visitors(reader,[function(**outgoing)])[0]
+			else: result,attrs = function(**outgoing)
+		# the spec records the provenance of an extended result
+		provenance = {}
+		if prefix:
+			result = merge_framewise([prefix_data,result],keys=list(result.keys()),
+				constant=framewise_this['constant'])
+			provenance['extended'] = dict(prefix=os.path.basename(prefix.files['dat']),
+				prefix_slice=prefix.slice.data,prefix_frames=prefix_frames,
+				frames=count_frames(result,framewise_this['constant']))
+			del prefix_data
+		with monitor.phase('store'): self.save_result(job,result,attrs,outgoing['checkpoint'])
+		del upstream
+		# prefer the true dimensions if the calculation opened the trajectory with the reader
+		if reader._universe is not None: frames,atoms = reader.n_frames,reader.n_atoms
+		else: frames,atoms = self.job_dimensions(job)
+		return self.finish_job(job,frames,atoms,monitor.stop(),**provenance)
+
+	def fuse_jobs(self,jobs):
+		"""
+		Group pending visitor jobs on the same slice so they share a single pass over the trajectory.
+		Jobs are only fused when they wait on the same pending upstream jobs.
+		"""
+		if not self.config.get('fuse_visitors',True): return list(jobs)
+		pending = set([id(j) for job in jobs for j in getattr(job,'jobs',[job])])
+		groups,scheduled = {},[]
+		for job in jobs:
+			# batches are already grouped
+			if hasattr(job,'jobs'): 
+				scheduled.append(job)
+				continue
+			function = self.get_calculation_function(job.calc.name)
+			if (not is_visitor(function) or job.resume or job.calc.raw['uptype']!='simulation'
+				# extended and derived results read a different window of frames
+				or getattr(job,'superset',None) or getattr(job,'preview',None)
+				or (framewise_spec(function) and self.find_prefix_result(job))):
+				scheduled.append(job)
+				continue
+			struct_file,traj_file = self.slice_files(job)
+			key = (tuple([struct_file]+str_or_list(traj_file)),
+				tuple(sorted([id(u) for u in job.upstream.values() if id(u) in pending])))
+			if key not in groups: 
+				groups[key] = []
+				scheduled.append(key)
+			groups[key].append(job)
+		scheduled = [i if not isinstance(i,tuple) else 
+			(groups[i][0] if len(groups[i])==1 else FusedJob(jobs=groups[i])) for i in scheduled]
+		for job in scheduled:
+			if hasattr(job,'jobs'): status('fusing %s on %s'%(','.join([j.calc.name for j in job.jobs]),
+				job.slice_upstream.data.get('basename',job.slice.data['sn'])),tag='compute')
+		return scheduled
+
+	def batch_jobs(self,jobs):
+		"""
+		Group the jobs from a parameter sweep on the same slice for calculations which accept a batch.
+		Jobs are only grouped when they use the same upstream jobs.
+		"""
+		groups,scheduled = {},[]
+		for job in jobs:
+			function = self.get_calculation_function(job.calc.name)
+			if (not is_sweep(function) or job.resume or getattr(job,'superset',None) or getattr(job,'preview',None)
+				or (framewise_spec(function) and self.find_prefix_result(job))):
+				scheduled.append(job)
+				continue
+			key = (job.calc.name,job.slice.data['sn'],id(job.slice_upstream),
+				tuple(sorted([(str(k),id(u)) for k,u in job.upstream.items()])))
+			if key not in groups: 
+				groups[key] = []
+				scheduled.append(key)
+			groups[key].append(job)
+		scheduled = [i if not isinstance(i,tuple) else 
+			(groups[i][0] if len(groups[i])==1 else BatchJob(jobs=groups[i])) for i in scheduled]
+		for job in scheduled:
+			if hasattr(job,'jobs'): status('batching %d values of the %s sweep for %s'%(
+				len(job.jobs),job.jobs[0].calc.name,job.slice.data['sn']),tag='compute')
+		return scheduled
+
+	def run_batch(self,batch,jnum=0):
+		"""
+		Run every job in a parameter sweep with a single call to the calculation.
+		"""
+		monitor = JobMonitor(trace=self.config.get('tracemalloc',True)).start()
+		first = batch.jobs[0]
+		status('running %d values of calculation %s %d/%d'%(len(batch.jobs),first.calc.name,
+			jnum+1,len(self.pending)),tag='compute')
+		for job in batch.jobs: job.result.style = 'computing'
+		function = self.get_calculation_function(first.calc.name)
+		# the jobs in a batch share their upstream data
+		with monitor.phase('upstream'): upstream = self.load_upstream(first)
+		outgoing = self.job_arguments(first,upstream)
+		outgoing['batch'] = [dict(specs=job.calc.specs) for job in batch.jobs]
+		with monitor.phase('function'): results = function(**outgoing)
+		if len(results)!=len(batch.jobs): raise Exception(
+			'calculation %s returned %d results for a batch of %d'%(first.calc.name,len(results),len(batch.jobs)))
+		with monitor.phase('store'):
+			for job,(result,attrs) in zip(batch.jobs,results): self.save_result(job,result,attrs,
+				outgoing['checkpoint'] if job is first else None)
+		reader = outgoing['reader']
+		if reader._universe is not None: frames,atoms = reader.n_frames,reader.n_atoms
+		else: frames,atoms = self.job_dimensions(first)
+		resources = monitor.stop()
+		# the history needs per-job figures so we split the time evenly between the jobs
+		share = dict(resources,batch=len(batch.jobs),
+			**dict([(k,resources[k]/len(batch.jobs)) for k in ['wall','cpu']]))
+		return {'reports':[self.finish_job(job,frames,atoms,share) for job in batch.jobs]}
+
+	def run_fused(self,fused,jnum=0):
+		"""
+		Run several visitor jobs with one pass over their shared slice.
+		"""
+		monitor = JobMonitor(trace=self.config.get('tracemalloc',True)).start()
+		status('running calculations %s %d/%d'%(','.join([j.calc.name for j in fused.jobs]),
+			jnum+1,len(self.pending)),tag='compute')
+		visitors,checkpoints = [],[]
+		for job in fused.jobs:
 			job.result.style = 'computing'
-			#! carefully print the result otherwise it double prints slice, calc
-			asciitree(dict(calculation={
-				'result':dict([(k,job.result.__dict__[k]) for k in ['files','spec_version','specs']]),
-				'slice_request':job.slice.__dict__,'calc':job.calc.__dict__,
-				'slice':job.slice_upstream.__dict__,}))
-			status('running calculation %d/%d'%(jnum+1,len(self.pending)),tag='compute')
+			with monitor.phase('upstream'): upstream = self.load_upstream(job)
 			function = self.get_calculation_function(job.calc.name)
-			# prepare the arguments
-			# +++ BUILD arguments structure as the compute function would expect
-			#! it would be nice to formalize this or make it less gromacs-specific? perhaps by using a mode?
-			outgoing = dict(workspace=self,sn=job.slice_upstream.data['sn'],calc=dict(specs=job.calc.specs))
-			# unpack files depending on the type of slice
-			#! note that this is where you would run a custom importer for non-MD data
-			if job.slice.style=='readymade':
-				struct_file = os.path.join(self.postdir,job.slice_upstream.data['structure'])
-				traj_file = [os.path.join(self.postdir,i) for i in str_or_list(
-					job.slice_upstream.data['trajectory'])]
-			elif job.slice.style=='slice_request_named':
-				#! post directory is hard-coded here
-				struct_file = os.path.join(self.postdir,'%s.%s'%(job.slice_upstream.data['basename'],'gro'))
-				traj_file = os.path.join(self.postdir,'%s.%s'%(job.slice_upstream.data['basename'],'xtc'))
-			else: raise Exception('dev')
-			# load upstream data files at the last moment
-			upstream = {}
-			for unum,(key,val) in enumerate(job.upstream.items()):
-				status('caching upstream data from calculation %s'%key,
-					i=unum,looplen=len(job.upstream),tag='load')
-				fn = val.result.files['dat']
-				data = load(os.path.basename(fn),cwd=os.path.dirname(fn))
-				upstream[key] = data
-			outgoing.update(upstream=upstream)
-			# we run plot_prepare because some calculation scripts require it
-			self.plot_prepare()
-			# redundant keywords are structure/grofile and trajectory/trajfile
-			outgoing = dict(grofile=struct_file,trajfile=traj_file,
-				structure=struct_file,trajectory=traj_file,**outgoing)
-			result,attrs = function(**outgoing)
-			# we remove the blank dat file before continuing. one of very few delete commands
-			if job.result.style!='computing': raise Exception('attmpting to compute a stale job')
-			os.remove(job.result.files['dat'])
-			store(obj=result,name=os.path.basename(job.result.files['dat']),
-				path=os.path.dirname(job.result.files['dat']),attrs=attrs,verbose=True)
-			# register the result as equivalent to one that had been read from disk
-			job.result.style = 'read'
-			del upstream
+			outgoing = self.job_arguments(job,upstream)
+			checkpoints.append(outgoing['checkpoint'])
+			visitors.append(function(**outgoing))
+		struct_file,traj_file = self.slice_files(fused.jobs[0])
+		reader = TrajectoryReader(structure=struct_file,trajectory=traj_file,
+			memory=self.config.get('reader_memory',TrajectoryReader.memory),
+			universes=self.universes,selections=self.selections,
+			coordinate_cache=self.config.get('coordinate_cache',False))
+		with monitor.phase('function'): results = run_visitors(reader,visitors)
+		with monitor.phase('store'):
+			for job,(result,attrs),checkpoint in zip(fused.jobs,results,checkpoints): 
+				self.save_result(job,result,attrs,checkpoint)
+		resources = monitor.stop()
+		# the history needs per-job figures so we split the time evenly between the fused jobs
+		share = dict(resources,fused=len(fused.jobs),
+			**dict([(k,resources[k]/len(fused.jobs)) for k in ['wall','cpu']]))
+		return {'reports':[self.finish_job(job,reader.n_frames,len(visitor.atoms),share) 
+			for job,visitor in zip(fused.jobs,visitors)]}
+
+	def partition_jobs(self,jobs):
+		"""
+		Split framewise jobs into ranges of frames which the scheduler can run at the same time.
+		Set compute_partitions in the config or use `make compute partitions=N` to choose the number of 
+		ranges. Otherwise jobs are only split when there are fewer jobs than workers. Jobs with ranges left
+		by an earlier run are split the same way so those ranges are reused.
+		"""
+		parts = self.partitions
+		if parts==None: parts = self.compute_jobs//max(1,len(jobs))
+		scheduled = []
+		for job in jobs:
+			# interrupted jobs resume from their checkpoint but failed jobs can reuse completed ranges
+			if (hasattr(job,'jobs') or Checkpoint.exists(job.result.files['dat']) 
+				or job.calc.raw['uptype']!='simulation' or getattr(job,'superset',None)
+				or getattr(job,'preview',None)): 
+				scheduled.append(job)
+				continue
+			function = self.get_calculation_function(job.calc.name)
+			# extended results read a different window of frames
+			if not framewise_spec(function) or self.find_prefix_result(job):
+				scheduled.append(job)
+				continue
+			count = self.partition_count(job)
+			# never split a slice into ranges with less than one frame each
+			if not count:
+				frames,atoms = self.job_dimensions(job)
+				count = min(parts,frames) if frames else parts
+			if count<=1:
+				scheduled.append(job)
+				continue
+			# the folder exists before any range runs so a range can write its checkpoint
+			dn = self.state_path('partitions')
+			if not os.path.isdir(dn): os.makedirs(dn)
+			partitions = [PartitionJob(job=job,part=part,parts=count,fn=os.path.join(dn,
+				'%s.part%dof%d'%(os.path.basename(job.result.files['dat']),part+1,count)))
+				for part in range(count)]
+			status('splitting %s on %s into %d ranges of frames'%(job.calc.name,job.slice.data['sn'],count),
+				tag='compute')
+			scheduled.extend(partitions+[MergeJob(partitions=partitions)])
+		return scheduled
+
+	def partition_count(self,job):
+		"""
+		Number of ranges for a job from the partial results of an earlier run, or None.
+		If an earlier run split the job more than one way we use the split with the most completed ranges.
+		"""
+		name = os.path.basename(job.result.files['dat'])
+		counts = {}
+		for fn in glob.glob(self.state_path('partitions/%s.part*of*'%name,create=False)):
+			match = re.match(r'^%s\.part(\d+)of(\d+)$'%re.escape(name),os.path.basename(fn))
+			if match: counts[int(match.group(2))] = counts.get(int(match.group(2)),0)+1
+		return max(counts,key=lambda k:(counts[k],k)) if counts else None
+
+	def run_partition(self,partition,jnum=0):
+		"""
+		Run a framewise calculation on one range of frames and save the partial result.
+		Partial results live in the bookkeeping folder until the merge, so an interrupted run reuses them.
+		"""
+		monitor = JobMonitor(trace=self.config.get('tracemalloc',True)).start()
+		job = partition.job
+		if os.path.isfile(partition.fn):
+			status('found %s'%partition.fn,tag='compute')
+			return dict(resources=monitor.stop(),atoms=None)
+		status('running calculation %s on frame range %d/%d'%(job.calc.name,partition.part+1,
+			partition.parts),tag='compute')
+		function = self.get_calculation_function(job.calc.name)
+		with monitor.phase('upstream'): upstream = self.load_upstream(job)
+		outgoing = self.job_arguments(job,upstream)
+		reader = outgoing['reader']
+		# the ranges divide the whole trajectory which we count without building the Universe here
+		reader.window = partition_window(reader.n_total,partition.part,partition.parts)
+		# each range has its own checkpoint next to its partial result
+		outgoing['checkpoint'] = Checkpoint(partition.fn,interval=self.config.get('checkpoint_interval'))
+		with monitor.phase('function'):
+			if is_visitor(function): result,attrs = run_visitors(reader,[function(**outgoing)])[0]
+			else: result,attrs = function(**outgoing)
+		with monitor.phase('store'): save_partition(partition.fn,result,attrs)
+		outgoing['checkpoint'].discard()
+		return dict(resources=monitor.stop(),atoms=reader.n_atoms)
+
+	def run_merge(self,merge,jnum=0):
+		"""
+		Merge the partial results for the ranges of a framewise job into its dat file.
+		"""
+		monitor = JobMonitor(trace=self.config.get('tracemalloc',True)).start()
+		job = merge.jobs[0]
+		job.result.style = 'computing'
+		status('merging %d ranges of frames for %s'%(len(merge.partitions),job.calc.name),tag='compute')
+		constant = framewise_spec(self.get_calculation_function(job.calc.name))['constant']
+		with monitor.phase('upstream'): parts = [load_partition(p.fn) for p in merge.partitions]
+		with monitor.phase('function'):
+			result = merge_framewise([r for r,a in parts],keys=list(parts[0][0].keys()),constant=constant)
+			attrs = parts[0][1]
+			del parts
+		with monitor.phase('store'): self.save_result(job,result,attrs)
+		for partition in merge.partitions: os.remove(partition.fn)
+		resources = monitor.stop()
+		# the history records the cost of the whole job so we add the figures from each range
+		reports = [p.report for p in merge.partitions if p.report]
+		for report in reports:
+			for key in ['wall','cpu','read_bytes','write_bytes']:
+				if key in resources and key in report['resources']: 
+					resources[key] += report['resources'][key]
+			for key in ['peak_rss','peak_traced']:
+				if key in resources and key in report['resources']: 
+					resources[key] = max(resources[key],report['resources'][key])
+		resources['partitions'] = len(merge.partitions)
+		atoms = ([r['atoms'] for r in reports if r['atoms']]+[None])[0]
+		return self.finish_job(job,count_frames(result,constant),atoms,resources)
+
+	def run_derive(self,job,jnum=0):
+		"""
+		Derive the result for a job from a completed result on a slice which contains its slice.
+		"""
+		monitor = JobMonitor(trace=self.config.get('tracemalloc',True)).start()
+		job.result.style = 'computing'
+		superset,window = job.superset
+		status('deriving calculation %d/%d from %s'%(jnum+1,len(self.pending),superset.files['dat']),
+			tag='compute')
+		constant = framewise_spec(self.get_calculation_function(job.calc.name))['constant']
+		with monitor.phase('upstream'):
+			data = load(os.path.basename(superset.files['dat']),cwd=os.path.dirname(superset.files['dat']))
+		with monitor.phase('function'): 
+			result,attrs = subsample_framewise(data,window,constant)
+			del data
+		with monitor.phase('store'): self.save_result(job,result,attrs)
+		frames = count_frames(result,constant)
+		# the spec records the provenance of a derived result
+		derived = dict(superset=os.path.basename(superset.files['dat']),superset_slice=superset.slice.data,
+			window=list(window),frames=frames)
+		return self.finish_job(job,frames,self.job_dimensions(job)[1],monitor.stop(),derived=derived)
+
+	def rewrite_spec(self,job,**meta):
+		"""
+		Add items to the meta dictionary in the spec file for a completed result.
+		"""
+		job.result.specs['meta'].update(**meta)
+		fn = job.result.files['spec']
+		with open(fn+'.tmp','w') as fp: fp.write(json.dumps(job.result.specs))
+		os.rename(fn+'.tmp',fn)
+
+	def run_compute(self):
+		"""
+		Run jobs and save to preemptive dat files.
+		Jobs are dispatched by a scheduler which uses the history of completed jobs to run the longest 
+		ones first. Set compute_jobs in the config or use `make compute jobs=N` to run jobs in parallel.
+		"""
+		history = JobHistory(self.state_path('history.json'))
+		run_log = RunLog(self.state_path('runlog.jsonl'))
+		# upstream results are held in memory while pending jobs still need them
+		self.upstream_cache = UpstreamCache(self.pending)
+		# fused jobs are scheduled as one job with the combined cost of their members
+		def estimate(job):
+			# a merge only reads the partial results and a derived result only reads its superset
+			if isinstance(job,MergeJob) or getattr(job,'superset',None): return 0.,True
+			figures = [history.estimate(j.calc.name,*self.job_dimensions(j)) for j in getattr(job,'jobs',[job])]
+			share = 1./job.parts if isinstance(job,PartitionJob) else 1.
+			return share*sum([i for i,j in figures]),all([j for i,j in figures])
+		def memory(job):
+			figures = [self.job_memory(j,history) for j in getattr(job,'jobs',[job])]
+			return None if all([i==None for i in figures]) else sum([i for i in figures if i!=None])
+		scheduler = JobScheduler(jobs=self.partition_jobs(self.fuse_jobs(self.batch_jobs(self.pending))),
+			workers=self.compute_jobs,
+			estimate=estimate,memory=memory,budget=memory_budget(self.config.get('compute_memory',None)))
+		scheduler.report()
+		# the governor divides the cores between jobs and limits the threads inside each one
+		governor = ResourceGovernor(jobs=self.compute_jobs,cores=self.config.get('compute_cores',None),
+			blas_threads=self.config.get('blas_threads',None))
+		governor.report()
+		def execute(job,jnum):
+			governor.enter(self)
+			# a job which raises must not leave tracemalloc or the thread limits in place in this process
+			try: return self.run_job(job,jnum)
+			finally: 
+				JobMonitor.release()
+				governor.exit()
+		def complete(job,report):
+			# partitions only pass their figures on to the merge
+			if isinstance(job,PartitionJob):
+				job.report = report
+				return
+			for job,report in zip(getattr(job,'jobs',[job]),report.get('reports',[report])):
+				# forked workers cannot update the result in this process so we do it here
+				job.result.style = 'read'
+				resources = report['resources']
+				# derived results and previews say nothing about the cost of the calculation
+				if not getattr(job,'superset',None) and not getattr(job,'preview',None):
+					history.record(calc=report['calc'],wall=resources['wall'],frames=report['frames'],
+						atoms=report['atoms'],peak_rss=resources['peak_rss'],
+						peak_traced=resources.get('peak_traced',None),
+						read_bytes=resources.get('read_bytes',None),write_bytes=resources.get('write_bytes',None))
+				run_log.append(**report)
+				self.journal.record(result_name(job.result.files['dat']),'completed')
+				self.upstream_cache.release(job)
+				# results from forked workers are read once here so the workers forked later inherit them
+				if self.upstream_cache.needed(job.result.files['dat']): 
+					self.upstream_cache.fetch(job.result.files['dat'])
+				if not getattr(job,'preview',None): self.discard_preview(job)
+		# load upstream data for the next jobs in the background while the current ones compute
+		prefetch = None
+		if self.config.get('prefetch',True):
+			prefetch = Prefetcher(self.upstream_cache,depth=self.compute_jobs,
+				memory=self.config.get('prefetch_memory',2**30),
+				slice_files=self.slice_files if self.config.get('prefetch_slices',True) else None).start()
+		def fail(job,error):
+			for job in getattr(job,'jobs',[job]):
+				self.mark_failed(job,error)
+				run_log.append(calc=job.calc.name,sn=job.slice.data['sn'],dat=job.result.files['dat'],
+					failed=error)
+				# the upstream data for a partition are released when its merge is skipped
+				if not isinstance(job,PartitionJob): self.upstream_cache.release(job)
+		try: scheduler.run(execute=execute,complete=complete,prefetch=prefetch,
+			fail=fail,keep_going=self.keep_going)
+		finally: 
+			if prefetch: prefetch.stop()
+			self.upstream_cache = None
+			# watch mode keeps the universes for the next run and clears them when the post spot changes
+			if not getattr(self,'watching',False): self.universes.clear()
+			self.journal.compact()
+
+	def plan_compute(self,jobs):
+		"""
+		Describe what the compute loop would do for a list of pending jobs without writing any files.
+		"""
+		history = JobHistory(self.state_path('history.json',create=False))
+		for job in jobs: job.superset = self.find_superset_result(job)
+		jobs_require_slices = self.connect_slices([job for job in jobs if not job.superset])
+		self.connect_upstream(jobs)
+		pending_ids = set([id(j) for j in jobs])
+		# slices which make_slices_automacs would create
+		slices = []
+		for slice_spec in self.slice_specs_automacs(
+			[j for j in jobs_require_slices if j.slice.style=='slice_request_named']):
+			spec = slice_spec['spec']
+			pbc_suffix = '' if not spec['pbc'] else '.pbc%s'%spec['pbc']
+			slices.append(dict(spec,name='%s.%d-%d-%d.%s%s'%(self.namer.alias(spec['sn']),
+				spec['start'],spec['end'],spec['skip'],spec['group'],pbc_suffix)))
+		# readymade slices are only registered by make_slices_readymade so we check the files here
+		missing_readymade = []
+		for job in [j for j in jobs_require_slices if j.slice.style=='readymade']:
+			fns = [os.path.join(self.postdir,fn) for key in ['structure','trajectory'] 
+				for fn in str_or_list(job.slice.data[key])]
+			if all([os.path.isfile(fn) for fn in fns]): job.slice_upstream = job.slice
+			elif job.slice.data['slice_name'] not in missing_readymade: 
+				missing_readymade.append(job.slice.data['slice_name'])
+		# count jobs by calculation and collection
+		counts = {}
+		for job in jobs:
+			collections = [c for c in str_or_list(job.calc.raw['collections'] or []) 
+				if job.slice.data['sn'] in self.metadata.collections.get(c,[])]
+			for collection in collections:
+				counts.setdefault(job.calc.name,{})
+				counts[job.calc.name][collection] = counts[job.calc.name].get(collection,0)+1
+		# estimate bytes read and written for each job
+		def file_size(fn): return os.path.getsize(fn) if os.path.isfile(fn) else None
+		details,unknown = [],{'read':0,'write':0}
+		totals = {'read':0,'write':0}
+		for job in jobs:
+			reads = []
+			if job.calc.raw['uptype']=='simulation':
+				if hasattr(job,'slice_upstream'): 
+					struct_file,traj_file = self.slice_files(job)
+					reads.extend([file_size(fn) for fn in [struct_file]+str_or_list(traj_file)])
+				else: reads.append(None)
+			for up in job.upstream.values():
+				if id(up) in pending_ids: reads.append(history.typical(up.calc.name,'write_bytes'))
+				else: reads.append(file_size(up.result.files['dat']))
+			write = history.typical(job.calc.name,'write_bytes')
+			for key,val in [('read',reads),('write',[write])]:
+				unknown[key] += len([i for i in val if i==None])
+				totals[key] += sum([i for i in val if i!=None])
+			estimate,known = history.estimate(job.calc.name,*self.job_dimensions(job))
+			details.append(dict(calc=job.calc.name,sn=job.slice.data['sn'],specs=job.calc.specs,
+				resume=job.resume,read_bytes=sum([i for i in reads if i!=None]),write_bytes=write,
+				runtime=estimate if known else None))
+		scheduler = JobScheduler(jobs=jobs,workers=self.compute_jobs,
+			estimate=lambda job:history.estimate(job.calc.name,*self.job_dimensions(job)))
+		levels = [dict([(name,len([j for j in level if j.calc.name==name])) 
+			for name in unique_ordered([j.calc.name for j in level])]) for level in scheduler.levels()]
+		makespan = scheduler.report()
+		return dict(slices=slices,readymade_missing=missing_readymade,jobs=counts,levels=levels,
+			derived=len([j for j in jobs if j.superset]),
+			bytes=dict(read=totals['read'],write=totals['write'],
+				unknown_reads=unknown['read'],unknown_writes=unknown['write']),
+			runtime=dict(makespan=makespan,workers=self.compute_jobs,
+				jobs_with_history=len([d for d in details if d['runtime']!=None])),
+			pending=details)
 
 	def fail_report(self):
 		"""Tell the user which files were incomplete."""
 		#! this function is deprecated in favor of standard error reporting with warnings in blank dat files
 		asciitree(dict(incomplete_jobs=dict([('job %d: %s'%(jj+1,j.style),j.files) 
 			for jj,j in enumerate([i.result for i in self.pending 
-				if i.result.__dict__['style'] in ['computing','new']])])))
-		status('compute loop failure means there many be preallocated files listed above. '
-			'omnicalc never deletes files so you should delete them to continue',tag='error')
+				if i.result.__dict__['style'] in ['computing','new'] and not self.failed_result(i.result)])])))
+		status('compute loop failure means the names listed above are still reserved in the journal. '
+			'the next `make compute` recovers them or you can roll them back with `make clear_stale`',
+			tag='error')
+		resumable = [i.result.files['dat'] for i in self.pending if Checkpoint.exists(i.result.files['dat'])]
+		if resumable: 
+			asciitree(dict(resumable_jobs=resumable))
+			status('the jobs above have checkpoints and will resume on the next `make compute`',tag='note')
+		retries = [i.result.files['dat'] for i in self.pending if self.failed_result(i.result)]
+		if retries:
+			asciitree(dict(failed_jobs=retries))
+			status('the jobs above failed and will be retried on the next `make compute`',tag='note')
 
 	###
 	### EXECUTION MODES
@@ -1610,6 +2464,11 @@ class WorkSpace:
 				view = [(sn,[('%s%s-%s'%stepname,[(i,j) for i,j in step.items()]) 
 					for stepname,step in details.items()]) for sn,details in view_od]
 				print('time_table = %s'%json.dumps(view))
+		elif not kwargs.keys() and args==('resources',):
+			# aggregate the resources recorded by run_job for each calculation
+			summary = RunLog(self.state_path('runlog.jsonl')).summarize()
+			if not summary: status('no jobs in the run log yet',tag='note')
+			else: asciitree(dict(resources=summary))
 		elif not kwargs.keys() and args==():
 			#! ipdb is good enough for now, but it was nice to get dropped into interactive mode
 			status('welcome to the workspace. take a look around!',tag='debug')
@@ -1619,25 +2478,122 @@ class WorkSpace:
 			ipdb.set_trace()
 		else: raise Exception('invalid call to look with args %s and kwargs %s'%(args,kwargs))
 
-	def compute(self,**kwargs):
+	def survey(self,quick=False):
 		"""
-		Run a calculation. This is the main loop, and precedes the plot loop.
+		Prepare jobs from the metadata and match them with completed results.
+		The quick survey returns True without reading the post spot if nothing changed since the last run.
 		"""
-		automatic = kwargs.pop('automatic',True)
-		skip = kwargs.pop('skip',False)
-		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
 		self.prelim()
 		# prepare jobs from these calculations
 		self.jobs = self.calcs.prepare_jobs()
+		# compare the inputs for each calculation with the plan from the last run
+		# a dry run only reads the bookkeeping files and never creates their folder
+		self.plan_cache = PlanCache(self.state_path('plan.json',create=not self.dry))
+		self.plan_digests = self.calculation_digests()
+		if quick and self.plan_cache.complete(self.jobs,self.plan_digests,self.postdir):
+			status('no calculations changed since the last run and all %d results are present'%
+				len(self.jobs),tag='status')
+			return True
+		# the journal reserves names for new results in the post spot
+		if not hasattr(self,'journal'): 
+			self.journal = Journal(self.state_path('journal.jsonl',create=not self.dry))
 		# parse the post-processing data only once (o/w multiple imports on plotload which calls compute)
 		if not hasattr(self,'post'):
 			self.post = PostDataLibrary(where=self.postdir,director=self.metadata.director,
-				legacy_post_mode=self.config.get('legacy_post_mode',False))
+				legacy_post_mode=self.config.get('legacy_post_mode',False),journal=self.journal,dry=self.dry)
 		# formalize the slice requests
 		# +++ BUILD slicemeta object (only uses the OmnicalcDataStructure for cross)
 		self.slices = SliceMeta(raw=self.metadata.slices,
 			slice_structures=self.metadata.director.get('slice_structures',{}))
 		self.check_compute()
+		return False
+
+	def calculation_digests(self):
+		"""
+		Digest the inputs for each calculation: its metadata, the simulations in its collections and their
+		slices, the name style, and the digests of its upstream calculations, so that a change to any 
+		calculation also changes the digests downstream of it.
+		"""
+		digests = {}
+		for calcname in [c for c in self.calcs.calc_order if c in self.calcs.toc]:
+			raw = self.metadata.calculations.get(calcname,{})
+			sns = self.metadata.get_simulations_in_collection(*str_or_list(raw.get('collections') or []))
+			upstream = set()
+			for calc in self.calcs.toc[calcname]:
+				requests = calc.specs.get('upstream',{}) or {}
+				upstream.update([requests] if type(requests) in str_types else list(requests))
+			digests[calcname] = digest(dict(calc=raw,sns=sns,slices=dict([(sn,self.metadata.slices.get(sn,None)) 
+				for sn in sns]),name_style=self.metadata.director.get('name_style',None),
+				upstream=sorted([(name,digests.get(name,None)) for name in upstream])))
+		return digests
+
+	def record_plan(self):
+		"""
+		Save the results for every calculation which has a completed result for each of its jobs.
+		"""
+		calcs = {}
+		for calcname,calc_digest in self.plan_digests.items():
+			jobs = [j for j in self.jobs if j.calc.name==calcname]
+			if not all([j.__dict__.get('result',None) and j.result.style=='read' 
+				and not self.failed_result(j.result) and not Checkpoint.exists(j.result.files['dat']) 
+				for j in jobs]): continue
+			calcs[calcname] = dict(digest=calc_digest,
+				results=dict([(job_key(j),result_name(j.result.files['dat'])) for j in jobs]))
+		self.plan_cache.save(calcs)
+
+	def upstream_closure(self,job):
+		"""
+		Collect the pending jobs required for a result, ordered so upstream jobs precede their consumers.
+		Completed jobs end the search since their own upstream data are no longer needed.
+		"""
+		closure = []
+		def visit(job):
+			if any([job is j for j in closure]) or not any([job is j for j in self.queue_computes]): return
+			self.connect_upstream([job])
+			for upstream in job.upstream.values(): visit(upstream)
+			closure.append(job)
+		visit(job)
+		return closure
+
+	def get(self,calcname,sn,**specs):
+		"""
+		Load one result for a simulation, computing it first if necessary.
+		Only the missing jobs in its upstream closure are computed, so unrelated pending calculations never
+		run or block the request. Keyword arguments select one calculation from a loop in the same way as
+		an upstream request in the metadata.
+		"""
+		self.survey()
+		request = self.collect_upstream_calculations({calcname:specs} if specs else calcname)[calcname]
+		job = self.connect_upstream_calculation(sn=sn,request=request)
+		closure = self.upstream_closure(job)
+		if closure:
+			status('computing %d jobs required for %s on %s'%(len(closure),calcname,sn),tag='compute')
+			self.prepare_compute(closure)
+			self.run_compute()
+		fn = job.result.files['dat']
+		data = load(os.path.basename(fn),cwd=os.path.dirname(fn))
+		if data.get('error',False) in ['error',b'error']:
+			raise Exception('calculation failed. clear the dat/spec files corresponding '
+				'to %s (by using `make clear_stale`) and recompute'%fn)
+		return data
+
+	def compute(self,**kwargs):
+		"""
+		Run a calculation. This is the main loop, and precedes the plot loop.
+		"""
+		automatic = kwargs.pop('automatic',True)
+		skip = kwargs.pop('skip',False)
+		if kwargs: raise Exception('unprocessed kwargs %s'%kwargs)
+		# a run with no changes since the last one stops before reading the post spot
+		if self.survey(quick=automatic and not skip and not self.dry and not self.debug): return
+		# the dry run describes the pending jobs and exits before any files are written
+		if self.dry:
+			self.plan = self.plan_compute(self.queue_computes)
+			asciitree(dict(plan=dict([(k,v) for k,v in self.plan.items() if k!='pending'])))
+			if self.plan_fn:
+				with open(self.plan_fn,'w') as fp: json.dump(self.plan,fp,indent=2)
+				status('wrote the compute plan to %s'%self.plan_fn,tag='status')
+			return
 		# if we have incomplete jobs then run them
 		if self.queue_computes and not automatic:
 			raise Exception('there are pending compute jobs. try `make compute` before plotting')
@@ -1660,13 +2616,112 @@ class WorkSpace:
 				ipdb.set_trace()
 				sys.exit(1)
 			elif self.debug=='stale':
-				raise Exception('cannot check for stale jobs when there are pending calculations')
+				# interrupted jobs with checkpoints are pending but they still have files to check
+				if any([not j.resume for j in self.queue_computes]):
+					raise Exception('cannot check for stale jobs when there are pending calculations')
+			elif self.preview: self.compute_previews(self.queue_computes)
 			else: 
 				# removed interrupt and error handling in favor of warnings in blank dat files caught by plot
 				self.prepare_compute(self.queue_computes)
 				self.run_compute()
+				self.record_plan()
 		# no compute jobs
-		else: pass
+		else: self.record_plan()
+
+	def preview_jobs(self,jobs):
+		"""
+		Copy the pending jobs which can run on a subsample of their slice. Only framewise calculations and
+		visitors are previewed since they read frames through the reader, and jobs with pending upstream jobs
+		or an existing preview are skipped.
+		"""
+		previews = []
+		for job in jobs:
+			if job.resume or job.calc.raw['uptype']!='simulation' or self.post.search_preview(job): continue
+			function = self.get_calculation_function(job.calc.name)
+			if not framewise_spec(function) and not is_visitor(function): continue
+			if len(self.upstream_closure(job))>1: continue
+			preview = copy.copy(job)
+			preview.preview = self.preview
+			# interrupted or failed previews are resumed with their reserved names
+			reserved = self.post.search_preview(job,pending=True)
+			if reserved: 
+				preview.result,preview.resume = reserved,True
+				preview.preview = reserved.specs['meta']['preview']['stride']
+			previews.append(preview)
+		return previews
+
+	def compute_previews(self,jobs):
+		"""
+		Compute previews for the pending jobs and continue with the full jobs in the background.
+		"""
+		previews = self.preview_jobs(jobs)
+		if previews:
+			status('computing %d previews with every %d frames'%(len(previews),self.preview),tag='compute')
+			self.prepare_compute(previews)
+			self.run_compute()
+		from base.tools import backrun
+		# the full jobs run with the same options as this one
+		backrun(command='make compute'+(' meta=%s'%self.meta_cursor if self.meta_cursor else '')+
+			' jobs=%d'%self.compute_jobs+(' keep_going' if self.keep_going else '')+
+			(' partitions=%d'%self.partitions if self.partitions else ''),log='log-compute')
+
+	def discard_preview(self,job):
+		"""
+		Remove the preview of a result once the full result is complete and roll back its name.
+		"""
+		preview = self.post.search_preview(job)
+		if not preview: return
+		# the name stays in the journal so sequential names never reuse its number
+		self.journal.record(result_name(preview.files['dat']),'rolled_back')
+		for fn in [preview.files['dat'],preview.files['spec']]:
+			if os.path.isfile(fn): os.remove(fn)
+		self.post.toc.pop(result_name(preview.files['dat']),None)
+		status('replaced the preview %s'%preview.files['dat'],tag='status')
+
+	def watch_compute(self):
+		"""
+		Keep the workspace resident and run the compute loop again whenever the specs, the calculation 
+		scripts, or the post spot change. The universes, calculation modules, and the post-processing library
+		are kept between runs, and the library is only parsed again when something else changes the post spot.
+		Parallel jobs open their universes in their own processes so only serial runs reuse them.
+		Changes to the calculation scripts are used by the next jobs but they do not invalidate results.
+		"""
+		specs_glob = os.path.join(self.cwd,*self.specs_path)
+		script_folders = sorted(set([dn for dn,dns,fns in os.walk(os.path.join(self.cwd,'calcs'))
+			if any([fn.endswith('.py') for fn in fns])]))
+		watcher = Watcher([specs_glob]+[os.path.join(dn,'*.py') for dn in script_folders]+
+			[os.path.join(self.postdir,'*')],interval=self.config.get('watch_interval',2.0))
+		status('watching %d folders with %s. use ctrl+c to stop'%(len(watcher.folders),watcher.method),
+			tag='status')
+		postdir = os.path.realpath(self.postdir)
+		changed = []
+		self.watching = True
+		try:
+			while True:
+				if not changed: changed = watcher.wait()
+				asciitree(dict(changed=changed))
+				# files in the post spot which we did not write ourselves require a new library
+				if any([os.path.dirname(fn)==postdir for fn in changed]):
+					self.__dict__.pop('post',None)
+					self.universes.clear()
+				# the script index is rebuilt in case scripts were added or moved
+				if any([fn.endswith('.py') for fn in changed]): self.script_index = {}
+				# the journal lists the results which this run reserves, completes, or rolls back
+				mark = len(self.journal.written) if hasattr(self,'journal') else 0
+				try: self.compute()
+				except Exception as e: 
+					tracebacker(e)
+					status('the compute loop failed. waiting for changes',tag='warning')
+				# we ignore changes to the files for these results. slices are not in the journal so the 
+				# ... library is parsed again after the compute loop makes them
+				names = set(self.journal.written[mark:]) if hasattr(self,'journal') else set()
+				changed = watcher.discard([os.path.join(postdir,'%s.%s'%(name,suffix)) for name in names 
+					for suffix in ['dat','spec',Checkpoint.suffix]])
+		except KeyboardInterrupt: status('stopped watching',tag='status')
+		finally: 
+			self.watching = False
+			self.universes.clear()
+			watcher.close()
 
 	def do_autoplot(self):
 		"""Easy way to see if this plot is an autoplot."""
@@ -1702,28 +2757,73 @@ class WorkSpace:
 ### INTERFACE FUNCTIONS
 ### note that these are imported by omni/cli.py and exposed to makeface
 
-def compute(debug=False,debug_slices=False,meta=None,back=False):
+def compute(debug=False,debug_slices=False,meta=None,back=False,jobs=None,dry=False,plan=None,
+	keep_going=False,partitions=None,watch=False,preview=False):
+	"""
+	Run the compute loop. Use `make compute dry` to see the plan without running anything and add 
+	plan="plan.json" to export it for job-submission scripts. Use `make compute keep_going` to continue 
+	with independent jobs after a failure and `make compute partitions=N` to split framewise jobs into
+	N ranges of frames. Use `make compute watch` to keep computing as the specs and scripts change and
+	`make compute preview` to compute every tenth frame first while the full jobs run in the background.
+	"""
 	if back: 
 		from base.tools import backrun
 		backrun(command='make compute',log='log-compute')
 	else:
 		status('generating workspace for compute',tag='status')
-		work = WorkSpace(compute=True,meta_cursor=meta,debug=debug)
+		work = WorkSpace(compute=True,meta_cursor=meta,debug=debug,jobs=jobs,dry=dry,plan=plan,
+			keep_going=keep_going,partitions=partitions,preview=preview)
+		if watch: work.watch_compute()
 def plot(*args,**kwargs):
 	status('generating workspace for plot',tag='status')
 	work = WorkSpace(plot=True,plot_args=args,plot_kwargs=kwargs)
 def go(*args,**kwargs): plot(*args,**kwargs)
 def look(*args,**kwargs):
 	work = WorkSpace(look=dict(args=args,kwargs=kwargs))
-def clear_stale(meta=None):
-	"""Check for stale jobs."""
+def clear_cache(coordinates=False,selections=False):
+	"""
+	Remove the coordinate caches next to the slices and the saved selection indices in the post spot.
+	Both are removed unless you choose one e.g. `make clear_cache coordinates`.
+	"""
+	postdir = read_config()['post_data_spot']
+	if not coordinates and not selections: coordinates = selections = True
+	if coordinates:
+		fns = CoordinateCache.purge_all(postdir)
+		status('removed %d coordinate cache files'%len(fns),tag='status')
+	if selections:
+		SelectionCache(os.path.join(postdir,'.omnicalc','selections')).purge()
+		status('removed the selection cache',tag='status')
+
+def clear_stale(meta=None,discard_checkpoints=False):
+	"""
+	Check for stale jobs. Names reserved in the journal by interrupted or failed runs are rolled back and
+	legacy placeholder files are removed. Jobs with checkpoints are kept so they can resume unless you 
+	discard them.
+	"""
 	work = WorkSpace(compute=True,meta_cursor=meta,debug='stale')
+	stales = []
+	for name,entry in work.journal.incomplete().items():
+		dat_fn = os.path.join(work.postdir,'%s.dat'%name)
+		if Checkpoint.exists(dat_fn) and not discard_checkpoints:
+			status('keeping %s because it has a checkpoint and will resume'%dat_fn,tag='note')
+			continue
+		elif Checkpoint.exists(dat_fn): Checkpoint(dat_fn).discard()
+		for fn in glob.glob(work.state_path('partitions/%s.dat.part*'%name,create=False)): 
+			# ranges may have left checkpoint folders next to their partial results
+			if os.path.isdir(fn): shutil.rmtree(fn)
+			else: os.remove(fn)
+		work.journal.record(name,'rolled_back')
+		stales.append(dat_fn)
+	# placeholder files from runs before the journal
 	fn_sizes = dict([((v.files['dat'],v.files['spec']),os.path.getsize(v.files['dat'])) 
-		for k,v in work.post.posts().items()])
+		for k,v in work.post.posts().items() if v.style=='read'])
 	targets = [(dat_fn,spec_fn) for (dat_fn,spec_fn),size in fn_sizes.items() if size<=10**4]
-	stales = []
 	for dat_fn,spec_fn in targets:
 		data = load(os.path.basename(dat_fn),cwd=os.path.dirname(dat_fn))
+		if Checkpoint.exists(dat_fn) and not discard_checkpoints:
+			status('keeping %s because it has a checkpoint and will resume'%dat_fn,tag='note')
+			continue
+		elif Checkpoint.exists(dat_fn): Checkpoint(dat_fn).discard()
 		if data.get('error',False)=='error': 
 			# one of very few places where we delete files because we are sure they are gabage
 			# ... the other place being the dat file deletion before writing the final file
@@ -1736,5 +2836,5 @@ def clear_stale(meta=None):
 		stales.append(dat_fn)
 	if stales:
 		asciitree({'cleaned files':sorted(stales)})
-		status('you can continue with `make compute` now. '
-			'we cleaned up stale dat files and corresponding spec files listed above')
+		status('you can continue with `make compute` now. we rolled back the reservations and '
+			'cleaned up stale dat files and corresponding spec files listed above')
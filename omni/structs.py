@@ -4,7 +4,7 @@
 OMNICALC DATA STRUCTURES
 """
 
-import os,sys,re,copy,glob
+import os,sys,re,copy,glob,json,hashlib
 
 from base.tools import catalog
 from datapack import asciitree,delveset,delve,str_types,dictsub,json_type_fixer
@@ -364,6 +364,18 @@ class NamingConvention:
 			'd2n':r'%(short_name)s.readymade.%(slice_name)s.%(calc_name)s',
 			'n2d':'^(?P<short_name>%(wild)s+)\.readymade\.(?P<slice_name>%(wild)s+)'+
 				'\.(?P<calc_name>%(wild)s+)\.n(?P<nnum>\d+)\.(dat|spec)$',}),
+		# content-addressed datspec names end with a digest of the calculation and slice instead of the nnum
+		('digest_datspec',{
+			'digest':True,
+			'd2n':r'%(short_name)s.%(start)s-%(end)s-%(skip)s.%(calc_name)s.h%(digest)s',
+			'n2d':'^(?P<short_name>%(wild)s+)\.'+
+				'(?P<start>%(float)s)-(?P<end>%(float)s)-(?P<skip>%(float)s)\.'+
+				'(?P<calc_name>%(wild)s+)\.h(?P<digest>[0-9a-f]{10})\.(dat|spec)$',}),
+		('readymade_digest_datspec',{
+			'digest':True,
+			'd2n':r'%(short_name)s.readymade.%(slice_name)s.%(calc_name)s.h%(digest)s',
+			'n2d':'^(?P<short_name>%(wild)s+)\.readymade\.(?P<slice_name>%(wild)s+)'+
+				'\.(?P<calc_name>%(wild)s+)\.h(?P<digest>[0-9a-f]{10})\.(dat|spec)$',}),
 		#??? unused
 		('raw_datspec',{
 			# we append the dat/spec suffix and the nnum later
@@ -450,6 +462,16 @@ class NameManager(NamingConvention):
 		spotname = self.get_spotname(sn)
 		return self.short_namer(sn,spotname)
 
+	def digest(self,job):
+		"""
+		Short and stable digest of the calculation specs and the slice for content-addressed names.
+		"""
+		identity = dict(calc=job.calc.name,specs=job.calc.specs,slice=job.slice.data)
+		# previews share the calculation and slice with the full result
+		if getattr(job,'preview',None): identity['preview'] = job.preview
+		identity = json.dumps(identity,sort_keys=True,default=str)
+		return hashlib.sha1(identity.encode()).hexdigest()[:10]
+
 	def basename(self,**kwargs):
 		"""
 		Name this slice.
@@ -474,5 +496,12 @@ class NameManager(NamingConvention):
 		elif name_style=='readymade_datspec':
 			request = dict(short_name=self.names_short[job.slice.data['sn']],calc_name=job.calc.name,
 				slice_name=job.slice.data['slice_name'])
+		elif name_style=='digest_datspec':
+			request = dict([(k,job.slice.data[k]) for k in ['start','end','skip']])
+			request.update(short_name=self.names_short[job.slice.data['sn']],calc_name=job.calc.name,
+				digest=self.digest(job))
+		elif name_style=='readymade_digest_datspec':
+			request = dict(short_name=self.names_short[job.slice.data['sn']],calc_name=job.calc.name,
+				slice_name=job.slice.data['slice_name'],digest=self.digest(job))
 		else: raise Exception('cannot pepare data for the namer for name_style %s'%name_style)
 		return self.parser[name_style]['d2n']%request
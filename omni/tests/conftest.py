@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for the parts of omnicalc which run without a simulation dataset.
+Run them with `python -m pytest omni/tests` from the root of the factory.
+"""
+
+import os,sys
+
+# the modules import each other from the omni folder in the same way as when makeface runs them
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
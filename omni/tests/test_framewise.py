@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import pytest
+from base.framewise import partition_window,subset_window
+
+@pytest.mark.parametrize('n_frames,parts',[(10,1),(10,3),(101,4),(7,7),(1000,16)])
+def test_partitions_cover_every_frame_once(n_frames,parts):
+	windows = [partition_window(n_frames,part,parts) for part in range(parts)]
+	frames = [fr for start,stop,step in windows for fr in range(start,stop)]
+	assert frames==list(range(n_frames))
+	sizes = [stop-start for start,stop,step in windows]
+	assert max(sizes)-min(sizes)<=1
+
+def test_more_partitions_than_frames_leaves_empty_ranges():
+	windows = [partition_window(2,part,4) for part in range(4)]
+	assert [stop-start for start,stop,step in windows]==[0,1,0,1]
+
+def slice_times(data):
+	"""Times of the frames in a slice from start to end every skip."""
+	return list(range(data['start'],data['end']+1,data['skip']))
+
+@pytest.mark.parametrize('inner',[dict(start=100,end=500,skip=20),dict(start=0,end=990,skip=10),
+	dict(start=100,end=505,skip=20),dict(start=1000,end=1000,skip=50),dict(start=30,end=300,skip=30)])
+def test_subset_window_selects_the_inner_frames(inner):
+	outer = dict(start=0,end=1000,skip=10)
+	start,stop,step = subset_window(outer,inner)
+	assert slice_times(outer)[start:stop:step]==slice_times(inner)
+
+@pytest.mark.parametrize('inner',[
+	# identical slices are not subsets
+	dict(start=0,end=1000,skip=10),
+	# starts between frames, skips a fraction of the outer skip, or reaches past the outer slice
+	dict(start=105,end=500,skip=20),dict(start=100,end=500,skip=15),dict(start=100,end=1500,skip=20),
+	dict(start=-10,end=500,skip=20),dict(start=500,end=100,skip=20),
+	# slices without times
+	dict(start=100,end=500),dict(start='first',end=500,skip=20),None])
+def test_subset_window_rejects_other_slices(inner):
+	assert subset_window(dict(start=0,end=1000,skip=10),inner)==None
+
+def test_subset_window_accepts_strings():
+	outer,inner = dict(start='0',end='1000',skip='10'),dict(start='100',end='500',skip='20')
+	assert subset_window(outer,inner)==(10,51,2)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import os,json
+import pytest
+from base.journal import Journal,result_name
+
+class Result:
+	"""A stand-in for a new PostData object."""
+	def __init__(self,where,name,**meta):
+		self.files = dict(dat=os.path.join(where,name+'.dat'),spec=os.path.join(where,name+'.spec'))
+		self.specs = dict(meta=dict(meta),calc={'name':name.split('.')[1]})
+
+@pytest.fixture
+def journal(tmpdir):
+	return Journal(str(tmpdir.join('journal.jsonl')))
+
+def reserve(journal,where,*names):
+	journal.reserve([Result(where,name) for name in names])
+
+def test_result_name():
+	assert result_name('/post/v1.lipid_areas.n0.dat')=='v1.lipid_areas.n0'
+
+def test_replay_keeps_the_last_state(journal,tmpdir):
+	reserve(journal,str(tmpdir),'v1.calc.n0','v1.calc.n1')
+	journal.record('v1.calc.n0','failed',error='broken')
+	journal.record('v1.calc.n1','completed')
+	names = journal.replay()
+	assert list(names.keys())==['v1.calc.n0','v1.calc.n1']
+	assert names['v1.calc.n0']['state']=='failed' and names['v1.calc.n0']['error']=='broken'
+	assert names['v1.calc.n0']['specs']['calc']=={'name':'calc'}
+	assert list(journal.incomplete().keys())==['v1.calc.n0']
+	assert journal.written==['v1.calc.n0','v1.calc.n1','v1.calc.n0','v1.calc.n1']
+
+def test_replay_skips_a_partial_line(journal,tmpdir):
+	reserve(journal,str(tmpdir),'v1.calc.n0')
+	with open(journal.fn,'a') as fp: fp.write('{"name": "v1.calc.n1", "sta')
+	assert list(journal.replay().keys())==['v1.calc.n0']
+
+def test_missing_journal_is_empty(journal):
+	assert journal.replay()=={} and journal.incomplete()=={}
+
+def test_recover_writes_the_spec_for_stored_results(journal,tmpdir):
+	where = str(tmpdir)
+	reserve(journal,where,'v1.calc.n0','v1.calc.n1')
+	journal.record('v1.calc.n0','failed',error='broken')
+	journal.reserve([Result(where,'v1.calc.n0',failed={'error':'broken'})])
+	tmpdir.join('v1.calc.n0.dat').write('data')
+	pending,stored = journal.recoverable(where)
+	assert list(pending.keys())==['v1.calc.n1'] and list(stored.keys())==['v1.calc.n0']
+	# checking for recoverable results writes nothing
+	assert not tmpdir.join('v1.calc.n0.spec').check()
+	pending = journal.recover(where)
+	assert list(pending.keys())==['v1.calc.n1']
+	spec = json.loads(tmpdir.join('v1.calc.n0.spec').read())
+	assert spec['calc']=={'name':'calc'} and 'failed' not in spec['meta']
+	assert journal.replay()['v1.calc.n0']['state']=='completed'
+	assert list(journal.incomplete().keys())==['v1.calc.n1']
+
+def test_recover_keeps_an_existing_spec(journal,tmpdir):
+	where = str(tmpdir)
+	reserve(journal,where,'v1.calc.n0')
+	tmpdir.join('v1.calc.n0.dat').write('data')
+	tmpdir.join('v1.calc.n0.spec').write('{"meta": {}}')
+	assert journal.recover(where)=={}
+	assert tmpdir.join('v1.calc.n0.spec').read()=='{"meta": {}}'
+
+def test_compact_drops_completed_names(journal,tmpdir):
+	reserve(journal,str(tmpdir),'v1.calc.n0','v1.calc.n1','v1.calc.n2')
+	journal.record('v1.calc.n0','completed')
+	journal.record('v1.calc.n1','rolled_back')
+	journal.compact()
+	names = journal.replay()
+	# rolled back names are kept so their numbers are never reused
+	assert list(names.keys())==['v1.calc.n1','v1.calc.n2']
+	assert [v['state'] for v in names.values()]==['rolled_back','reserved']
+	with open(journal.fn) as fp: assert len(fp.readlines())==2
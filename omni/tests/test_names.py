@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+import re,collections
+from structs import NameManager
+
+class Calc:
+	def __init__(self,name,specs): self.name,self.specs = name,specs
+
+class Slice:
+	def __init__(self,data): self.data = data
+
+class Job:
+	"""A stand-in for a compute job with a calculation and a slice."""
+	def __init__(self,name='lipid_areas',specs=None,preview=None,**data):
+		self.calc = Calc(name,specs if specs!=None else {'upstream':{'lipid_abstractor':{'cutoff':2.0}}})
+		self.slice = Slice(dict(dict(sn='membrane-v1',start=0,end=1000,skip=10,group='lipids'),**data))
+		if preview: self.preview = preview
+
+def digest(job): return NameManager().digest(job)
+
+def test_digest_is_short_and_stable():
+	assert re.match('^[0-9a-f]{10}$',digest(Job()))
+	assert digest(Job())==digest(Job())
+
+def test_digest_ignores_key_order():
+	specs = collections.OrderedDict([('b',1),('a',2)])
+	assert digest(Job(specs=specs))==digest(Job(specs=dict(a=2,b=1)))
+
+def test_digest_changes_with_the_inputs():
+	digests = [digest(job) for job in [Job(),Job(name='lipid_mesh'),Job(specs={}),
+		Job(end=2000),Job(sn='membrane-v2'),Job(preview=10)]]
+	assert len(set(digests))==len(digests)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import pytest
+from base.plan import PlanCache,digest,job_key
+
+class Calc:
+	def __init__(self,name,specs): self.name,self.specs = name,specs
+
+class Slice:
+	def __init__(self,sn): self.data = dict(sn=sn)
+
+class Job:
+	"""A stand-in for a compute job with a calculation and a slice."""
+	def __init__(self,name,sn,**specs): self.calc,self.slice = Calc(name,specs),Slice(sn)
+
+@pytest.fixture
+def saved(tmpdir):
+	"""A plan with two results for one calculation which are both in the post spot."""
+	jobs = [Job('lipid_areas','v1',cutoff=2.0),Job('lipid_areas','v2',cutoff=2.0)]
+	plan = PlanCache(str(tmpdir.join('plan.json')))
+	names = ['%s.lipid_areas.n0'%job.slice.data['sn'] for job in jobs]
+	plan.save({'lipid_areas':dict(digest='abc',results=dict([(job_key(job),name) 
+		for job,name in zip(jobs,names)]))})
+	for name in names:
+		for suffix in ['dat','spec']: tmpdir.join('%s.%s'%(name,suffix)).write('')
+	return PlanCache(plan.fn),jobs
+
+def test_digest_ignores_key_order():
+	assert digest(dict(a=1,b=[1,2]))==digest(dict(b=[1,2],a=1))
+	assert digest(dict(a=1))!=digest(dict(a=2))
+
+def test_job_key_depends_on_specs_and_simulation():
+	keys = [job_key(job) for job in [Job('calc','v1',a=1),Job('calc','v2',a=1),Job('calc','v1',a=2)]]
+	assert len(set(keys))==3
+
+def test_results_for_unchanged_calculations(saved):
+	plan,jobs = saved
+	assert [plan.result(job,'abc') for job in jobs]==['v1.lipid_areas.n0','v2.lipid_areas.n0']
+	assert plan.result(jobs[0],'changed')==None
+	assert plan.result(Job('lipid_areas','v1',cutoff=3.0),'abc')==None
+	assert plan.result(Job('lipid_mesh','v1'),'abc')==None
+
+def test_complete_when_nothing_changed(saved,tmpdir):
+	plan,jobs = saved
+	assert plan.complete(jobs,{'lipid_areas':'abc'},str(tmpdir))
+
+def test_changed_digest_invalidates(saved,tmpdir):
+	plan,jobs = saved
+	assert not plan.complete(jobs,{'lipid_areas':'changed'},str(tmpdir))
+
+def test_new_calculation_invalidates(saved,tmpdir):
+	plan,jobs = saved
+	assert not plan.complete(jobs+[Job('lipid_mesh','v1')],
+		{'lipid_areas':'abc','lipid_mesh':'def'},str(tmpdir))
+
+def test_new_job_invalidates(saved,tmpdir):
+	plan,jobs = saved
+	assert not plan.complete(jobs+[Job('lipid_areas','v3',cutoff=2.0)],{'lipid_areas':'abc'},str(tmpdir))
+
+def test_missing_file_invalidates(saved,tmpdir):
+	plan,jobs = saved
+	tmpdir.join('v2.lipid_areas.n0.spec').remove()
+	assert not plan.complete(jobs,{'lipid_areas':'abc'},str(tmpdir))
+
+def test_damaged_plan_starts_over(tmpdir):
+	tmpdir.join('plan.json').write('{"calcs": {"lipid')
+	assert PlanCache(str(tmpdir.join('plan.json'))).calcs=={}
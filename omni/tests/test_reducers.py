@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('joblib')
+from base.compute_loop import Reducer,Sum,MeanVariance,Histogram,reduce_frames
+
+def values(n_frames=40,shape=(3,)):
+	return np.random.RandomState(0).normal(loc=5.,scale=2.,size=(n_frames,)+shape)
+
+def reduce_split(reducer,data,split):
+	"""Reduce two consecutive chunks of frames separately and combine them."""
+	partials = []
+	for chunk in [data[:split],data[split:]]:
+		partial = None
+		for value in chunk: partial = reducer.add(partial,value)
+		partials.append(partial)
+	return reducer.finish(reducer.merge(*partials))
+
+@pytest.mark.parametrize('split',[0,1,17,39,40])
+def test_sum_combines_chunks(split):
+	data = values()
+	assert np.allclose(reduce_split(Sum(),data,split),data.sum(axis=0))
+
+@pytest.mark.parametrize('split',[0,1,17,39,40])
+def test_mean_variance_combines_chunks(split):
+	data = values()
+	result = reduce_split(MeanVariance(ddof=1),data,split)
+	assert result['count']==len(data)
+	assert np.allclose(result['mean'],data.mean(axis=0))
+	assert np.allclose(result['var'],data.var(axis=0,ddof=1))
+
+def test_mean_variance_keeps_precision_with_a_large_offset():
+	data = values()+1e9
+	result = reduce_split(MeanVariance(),data,13)
+	assert np.allclose(result['var'],(data-1e9).var(axis=0),rtol=1e-6)
+
+def test_mean_variance_needs_frames():
+	with pytest.raises(Exception): MeanVariance().finish(None)
+
+@pytest.mark.parametrize('split',[0,1,17,40])
+def test_histogram_combines_chunks(split):
+	data = values()
+	reducer = Histogram(bins=8,range=(0.,10.))
+	result = reduce_split(reducer,data,split)
+	counts,edges = np.histogram(data.ravel(),bins=reducer.edges)
+	assert np.array_equal(result['counts'],counts) and np.array_equal(result['edges'],edges)
+
+def test_histogram_ignores_values_outside_the_edges():
+	reducer = Histogram(bins=[0.,1.,2.])
+	result = reduce_split(reducer,np.array([[-1.,0.5],[1.5,3.]]),1)
+	assert list(result['counts'])==[1,1]
+
+def test_histogram_needs_a_range_for_a_number_of_bins():
+	with pytest.raises(Exception): Histogram(bins=8)
+
+def test_custom_reducer_and_chunks():
+	maximum = Reducer(add=lambda partial,value:value if partial is None else max(partial,value),
+		combine=max)
+	assert reduce_frames(lambda fr:(fr*7)%11,maximum,30,chunks=4)==10
+	assert reduce_frames(lambda fr:fr,Sum(),range(100),chunks=7)==sum(range(100))
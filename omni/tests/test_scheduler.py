@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+import pytest
+from base.scheduler import JobScheduler
+
+class Calc:
+	def __init__(self,name): self.name = name
+
+class Job:
+	"""A stand-in for a compute job with an expected runtime and upstream jobs."""
+	def __init__(self,name,cost,upstream=(),memory=None):
+		self.calc = Calc(name)
+		self.cost = cost
+		self.memory = memory
+		self.upstream = dict([(j.calc.name,j) for j in upstream])
+
+def scheduler(jobs,**kwargs):
+	return JobScheduler(jobs=jobs,estimate=lambda job:(job.cost,True),memory=lambda job:job.memory,**kwargs)
+
+def run_order(jobs,**kwargs):
+	"""Run the jobs in this process and return the names in the order they ran."""
+	order = []
+	scheduler(jobs).run(execute=lambda job,jnum:order.append(job.calc.name),
+		complete=lambda job,report:None,**kwargs)
+	return order
+
+def test_independent_jobs_run_longest_first():
+	jobs = [Job('short',1.),Job('long',10.),Job('middle',5.)]
+	assert run_order(jobs)==['long','middle','short']
+
+def test_upstream_jobs_run_first():
+	first = Job('first',1.)
+	jobs = [Job('second',10.,upstream=[first]),first]
+	assert run_order(jobs)==['first','second']
+
+def test_critical_path_ranks_chains_ahead_of_longer_jobs():
+	head = Job('head',1.)
+	tail = Job('tail',10.,upstream=[head])
+	alone = Job('alone',5.)
+	this = scheduler([alone,tail,head])
+	assert this.priority[id(head)]==11. and this.priority[id(alone)]==5.
+	assert run_order([alone,tail,head])==['head','tail','alone']
+
+def test_levels_follow_dependencies():
+	a = Job('a',1.)
+	b = Job('b',1.,upstream=[a])
+	c = Job('c',1.,upstream=[a,b])
+	d = Job('d',1.)
+	levels = scheduler([c,b,a,d]).levels()
+	assert [sorted([j.calc.name for j in level]) for level in levels]==[['a','d'],['b'],['c']]
+
+def test_makespan_fills_the_workers():
+	jobs = [Job('a',3.),Job('b',2.),Job('c',1.)]
+	assert scheduler(jobs,workers=2).makespan()==3.
+	assert scheduler(jobs,workers=1).makespan()==6.
+
+def test_forked_reports_larger_than_the_pipe():
+	jobs = [Job('a',2.),Job('b',1.)]
+	reports = {}
+	def complete(job,report): reports[job.calc.name] = report
+	scheduler(jobs,workers=2).run(execute=lambda job,jnum:job.calc.name*200000,complete=complete)
+	assert reports=={'a':'a'*200000,'b':'b'*200000}
+
+def test_admission_without_a_budget_takes_the_first_ready_job():
+	jobs = [Job('a',2.,memory=10**12),Job('b',1.,memory=10**12)]
+	this = scheduler(jobs,workers=2)
+	assert this.admit(jobs,[jobs[1]]) is jobs[0]
+
+def test_admission_starts_smaller_jobs_that_fit():
+	big,small,running = Job('big',3.,memory=60),Job('small',1.,memory=20),Job('running',2.,memory=50)
+	this = scheduler([big,small,running],workers=3,budget=100)
+	assert this.admit([big,small],[running]) is small
+	assert this.admit([big],[running]) is None
+	assert this.admit([big,small],[]) is big
+
+def test_admission_counts_unknown_memory_as_zero():
+	known,unknown = Job('known',2.,memory=100),Job('unknown',1.)
+	this = scheduler([known,unknown],workers=2,budget=100)
+	assert this.admit([unknown],[known]) is unknown
+
+def test_oversize_jobs_run_alone():
+	huge,small,running = Job('huge',3.,memory=200),Job('small',1.,memory=10),Job('running',2.,memory=10)
+	this = scheduler([huge,small,running],workers=3,budget=100)
+	# the oversize job at the front of the queue waits for the running jobs and holds back the others
+	assert this.admit([huge,small],[running]) is None
+	assert this.admit([huge,small],[]) is huge
+	assert this.admit([small],[huge]) is None
+
+def test_forked_run_respects_the_budget():
+	import time
+	jobs = [Job('a',3.,memory=60),Job('b',2.,memory=60),Job('c',1.,memory=30)]
+	spans = {}
+	def execute(job,jnum):
+		start = time.time()
+		time.sleep(0.2)
+		return (start,time.time())
+	def complete(job,report): spans[job.calc.name] = report
+	scheduler(jobs,workers=3,budget=100).run(execute=execute,complete=complete)
+	# the two large jobs never overlap while the small one runs beside the first
+	assert spans['b'][0]>=spans['a'][1] or spans['a'][0]>=spans['b'][1]
+	assert spans['c'][0]<spans['a'][1]
+
+def failing_run(keep_going,workers=1):
+	"""Run a failing job with a downstream job and an independent one and return the outcomes."""
+	broken = Job('broken',3.)
+	jobs = [broken,Job('downstream',2.,upstream=[broken]),Job('independent',1.)]
+	ran,failed = [],{}
+	def execute(job,jnum):
+		if job.calc.name=='broken': raise Exception('this calculation is broken')
+		return job.calc.name
+	def fail(job,error): failed[job.calc.name] = error
+	with pytest.raises(Exception) as error:
+		scheduler(jobs,workers=workers).run(execute=execute,complete=lambda job,report:ran.append(report),
+			fail=fail,keep_going=keep_going)
+	return ran,failed,str(error.value)
+
+def test_failure_stops_the_run():
+	ran,failed,error = failing_run(keep_going=False)
+	assert ran==[] and sorted(failed.keys())==['broken','downstream']
+	assert 'this calculation is broken' in failed['broken']
+	assert error.startswith('1 jobs failed and 1 were skipped (0 completed, 1 not started)')
+
+@pytest.mark.parametrize('workers',[1,2])
+def test_keep_going_runs_independent_jobs(workers):
+	ran,failed,error = failing_run(keep_going=True,workers=workers)
+	assert ran==['independent']
+	assert sorted(failed.keys())==['broken','downstream']
+	assert failed['downstream']=='skipped because upstream job broken failed'
+	assert error.startswith('1 jobs failed and 1 were skipped (1 completed)')